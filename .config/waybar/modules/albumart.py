@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Album art thumbnails for the media widget.
+
+Art is fetched once (http(s):// or file://), scaled down to ART_SIZE and
+stored in $XDG_CACHE_HOME/waybar/album-art/ under the hash of the original
+image, so two URLs serving the same picture share one thumbnail. A small
+link per URL points at it, which lets a repeated play skip both the
+network and the decode. The cache is kept under CACHE_MAX bytes by evicting
+the least recently used thumbnails first (a hit refreshes the mtime).
+
+    albumart.py URL   prints the thumbnail path for URL, fetching it if needed
+"""
+import hashlib
+import os
+import sys
+
+import paths
+from paths import atomic_write, atomic_symlink
+
+CACHE_DIR = os.path.join(paths.CACHE_DIR, "album-art")
+ART_SIZE = 96  # Pixels, longest side
+CACHE_MAX = 16 * 1024 * 1024
+FETCH_TIMEOUT = 5
+MAX_DOWNLOAD = 10 * 1024 * 1024
+
+def url_link(url):
+    return os.path.join(CACHE_DIR, hashlib.sha256(url.encode()).hexdigest() + ".url")
+
+def lookup(url):
+    """Cached thumbnail for url, or None. A hit marks it as recently used."""
+    path = os.path.realpath(url_link(url))
+    try:
+        os.utime(path)
+        return path
+    except OSError:
+        return None
+
+def fetch(url, timeout=FETCH_TIMEOUT):
+    import urllib.request
+    with urllib.request.urlopen(url, timeout=timeout) as r:
+        data = r.read(MAX_DOWNLOAD + 1)
+    if len(data) > MAX_DOWNLOAD:
+        raise ValueError(f"Album art larger than {MAX_DOWNLOAD} bytes: {url}")
+    return data
+
+def scale(data, size=ART_SIZE):
+    """PNG bytes of the image, shrunk to fit size x size."""
+    import gi
+    gi.require_version("GdkPixbuf", "2.0")
+    from gi.repository import GdkPixbuf
+    loader = GdkPixbuf.PixbufLoader()
+    loader.write(data)
+    loader.close()
+    pixbuf = loader.get_pixbuf()
+    width, height = pixbuf.get_width(), pixbuf.get_height()
+    factor = size / max(width, height)
+    if factor < 1:
+        pixbuf = pixbuf.scale_simple(max(1, round(width * factor)), max(1, round(height * factor)),
+                                     GdkPixbuf.InterpType.BILINEAR)
+    return pixbuf.save_to_bufferv("png", [], [])[1]
+
+def store(url, data):
+    """Thumbnail path for the image bytes `data`, linked from url."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, hashlib.sha256(data).hexdigest() + ".png")
+    if os.path.exists(path):
+        os.utime(path)  # Same picture under another URL, nothing to decode
+    else:
+        atomic_write(path, scale(data))
+
+    atomic_symlink(os.path.basename(path), url_link(url))
+    evict()
+    return path
+
+def evict(limit=CACHE_MAX):
+    thumbnails = []
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".png"):
+            path = os.path.join(CACHE_DIR, name)
+            try:
+                st = os.stat(path)
+                thumbnails.append((st.st_mtime, st.st_size, path))
+            except OSError:
+                pass
+
+    total = sum(size for _, size, _ in thumbnails)
+    for _, size, path in sorted(thumbnails):
+        if total <= limit:
+            break
+        try:
+            os.unlink(path)
+            total -= size
+        except OSError:
+            pass
+
+    # Links whose thumbnail was just evicted
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        if name.endswith(".url") and not os.path.exists(path):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+def thumbnail(url):
+    """Path of url's thumbnail, fetching and scaling it on a miss. Blocks."""
+    return lookup(url) or store(url, fetch(url))
+
+if __name__ == "__main__":
+    print(thumbnail(sys.argv[1]))
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""Benchmarks for the waybar modules, run against the trees in fixtures.py.
+
+Every case runs --runs times (the median is reported) with WAYBAR_FS_ROOT
+pointing at a fixture, stub tools first on PATH, fresh XDG dirs and all
+network lookups answered by a local HTTP server:
+
+  total     wall time of a one-shot run, or until a resident one is stopped
+  first     time to the first JSON line
+  rss       peak RSS of the module process, MiB
+  forks     processes started (fork/clone without CLONE_THREAD), needs strace
+  syscalls  system calls made by the module and its children, needs strace
+
+    bench.py [--runs N] [--fixture NAME] [--case NAME] [--json FILE] [--compare FILE]
+
+--json saves the results; --compare prints the change against a saved file
+and exits 1 if a timing or syscall count grew by more than --threshold.
+"""
+import argparse
+import json
+import os
+import re
+import select
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import fixtures
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+FIRST_LINE_TIMEOUT = 5
+IDLE_TIMEOUT = 1  # How long a module that has nothing to print is left running
+
+# name: (script, arguments, mode, prepare)
+#   mode "exit": one-shot, runs to completion
+#   mode "stream": resident, stopped after its first line
+#   prepare: "cold" empties the caches before every run, "warm" primes them once
+CASES = {
+    "sys-mon": ("sys-mon.py", [], "exit", "warm"),
+    "sys-mon-stream": ("sys-mon.py", ["--stream"], "stream", None),
+    "sys-mon-rocm-smi": ("sys-mon.py", ["--gpu", "rocm-smi"], "exit", "warm"),
+    "network": ("network-info.py", [], "stream", "warm"),
+    "weather": ("weather.py", [], "exit", "warm"),
+    "weather-cold": ("weather.py", [], "exit", "cold"),
+    "mediaplayer": ("mediaplayer.py", ["--player", "spotify"], "stream", None),
+}
+
+# ---------------------------
+# FAKE SERVICES
+# ---------------------------
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/ipinfo":
+            body = fixtures.IPINFO
+        elif url.path == "/forecast":
+            latitudes = parse_qs(url.query).get("latitude", ["0"])[0].split(",")
+            body = [fixtures.forecast() for _ in latitudes]
+            body = body if len(body) > 1 else body[0]
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+# ---------------------------
+# MEASUREMENT
+# ---------------------------
+def run_once(command, env, mode):
+    """Run one module process; returns a dict of measurements."""
+    start = time.monotonic()
+    proc = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            start_new_session=True)
+    first = None
+    deadline = start + (FIRST_LINE_TIMEOUT if mode == "exit" else IDLE_TIMEOUT)
+    while first is None and time.monotonic() < deadline:
+        ready, _, _ = select.select([proc.stdout], [], [], max(0, deadline - time.monotonic()))
+        if not ready:
+            break
+        if proc.stdout.readline():
+            first = time.monotonic() - start
+        else:
+            break  # EOF
+        if mode == "exit":
+            break
+
+    stopped = mode == "stream" or proc.poll() is None and time.monotonic() >= deadline
+    if stopped:
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    _, status, usage = os.wait4(proc.pid, 0)
+    total = time.monotonic() - start
+    # The whole group goes, so stub tool loops do not outlive the run
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    stderr = proc.stderr.read().decode(errors="replace").strip()
+    proc.stdout.close()
+    proc.stderr.close()
+
+    failed = os.waitstatus_to_exitcode(status) not in ((0, -signal.SIGTERM) if stopped else (0,))
+    return {
+        "total": total * 1000,
+        "first": first * 1000 if first is not None else None,
+        "rss": usage.ru_maxrss / 1024,
+        "error": stderr.splitlines()[-1] if failed and stderr else ("exit status" if failed else None),
+    }
+
+SYSCALL_RE = re.compile(r"^(\d+)\s+(\w+)\(")
+
+def count_syscalls(command, env, mode, strace):
+    """(forks, syscalls) from an strace -f log of one run."""
+    with tempfile.NamedTemporaryFile("r", suffix=".strace") as log:
+        run_once([strace, "-f", "-qq", "-o", log.name, "--", *command], env, mode)
+        forks = syscalls = 0
+        for line in log:
+            match = SYSCALL_RE.match(line)
+            if not match:
+                continue  # "<... resumed>" halves and signals
+            syscalls += 1
+            name = match.group(2)
+            if name in ("fork", "vfork") or (name in ("clone", "clone3") and "CLONE_THREAD" not in line):
+                forks += 1
+        return forks, syscalls
+
+def prepare(kind, env):
+    cache = env["XDG_CACHE_HOME"]
+    if kind == "cold":
+        shutil.rmtree(cache, ignore_errors=True)
+    os.makedirs(cache, exist_ok=True)
+    os.makedirs(env["XDG_RUNTIME_DIR"], exist_ok=True)
+
+def bench_case(name, fixture, root, url, runs, strace):
+    script, arguments, mode, kind = CASES[name]
+    command = [sys.executable, os.path.join(MODULE_DIR, script), *arguments]
+    scratch = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    env = dict(os.environ,
+               WAYBAR_FS_ROOT=root,
+               PATH=f"{root}/bin:{os.environ.get('PATH', '')}",
+               XDG_RUNTIME_DIR=os.path.join(scratch, "run"),
+               XDG_CACHE_HOME=os.path.join(scratch, "cache"),
+               WAYBAR_IPINFO_URL=f"{url}/ipinfo",
+               WAYBAR_WEATHER_URL=f"{url}/forecast?latitude={{lat}}&longitude={{lon}}",
+               PYTHONDONTWRITEBYTECODE="1")
+    try:
+        prepare(kind, env)
+        if kind == "warm":
+            run_once(command, env, mode)
+
+        samples = []
+        for _ in range(runs):
+            prepare(kind, env)
+            samples.append(run_once(command, env, mode))
+        errors = [s["error"] for s in samples if s["error"]]
+        result = {"case": name, "fixture": fixture, "error": errors[0] if errors else None}
+        for metric in ("total", "first", "rss"):
+            values = [s[metric] for s in samples if s[metric] is not None]
+            result[metric] = statistics.median(values) if values else None
+
+        result["forks"] = result["syscalls"] = None
+        if strace and not errors:
+            prepare(kind, env)
+            result["forks"], result["syscalls"] = count_syscalls(command, env, mode, strace)
+        return result
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+# ---------------------------
+# REPORT
+# ---------------------------
+def cell(value, width, spec=""):
+    return f"{'-' if value is None else format(value, spec):>{width}}"
+
+def report(results, baseline=None, threshold=None):
+    """Print the table; returns True if anything regressed past threshold."""
+    previous = {(r["case"], r["fixture"]): r for r in baseline or []}
+    regressed = False
+    print(f"{'case':<18} {'fixture':<12} {'total ms':>9} {'first ms':>9} {'rss MiB':>8} {'forks':>6} {'syscalls':>9}")
+    for r in results:
+        line = (f"{r['case']:<18} {r['fixture']:<12} {cell(r['total'], 9, '.1f')} {cell(r['first'], 9, '.1f')} "
+                f"{cell(r['rss'], 8, '.1f')} {cell(r['forks'], 6)} {cell(r['syscalls'], 9)}")
+        old = previous.get((r["case"], r["fixture"]))
+        if old:
+            changes = []
+            for metric in ("first", "total", "syscalls"):
+                if r.get(metric) and old.get(metric):
+                    change = (r[metric] - old[metric]) / old[metric] * 100
+                    changes.append(f"{metric} {change:+.0f}%")
+                    if threshold is not None and change > threshold:
+                        regressed = True
+                        changes[-1] += " !"
+            line += "  " + ", ".join(changes)
+        if r["error"]:
+            line += f"  ({r['error']})"
+        print(line)
+    return regressed
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark the waybar modules against fixture trees")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--fixture", action="append", choices=fixtures.FIXTURES,
+                        help="Only this fixture (repeatable)")
+    parser.add_argument("--case", action="append", choices=CASES, help="Only this case (repeatable)")
+    parser.add_argument("--json", help="Save the results to this file")
+    parser.add_argument("--compare", help="Compare against results saved with --json")
+    parser.add_argument("--threshold", type=float, default=20,
+                        help="Percent increase that counts as a regression with --compare")
+    parser.add_argument("--no-strace", action="store_true", help="Skip fork and syscall counts")
+    return parser.parse_args()
+
+def main():
+    arguments = parse_arguments()
+    strace = None if arguments.no_strace else shutil.which("strace")
+    if strace is None and not arguments.no_strace:
+        print("strace not found, fork and syscall counts are skipped", file=sys.stderr)
+
+    url = start_server()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="waybar-fixtures-") as base:
+        for fixture in arguments.fixture or fixtures.FIXTURES:
+            root = fixtures.build(fixture, os.path.join(base, fixture))
+            for name in arguments.case or CASES:
+                results.append(bench_case(name, fixture, root, url, arguments.runs, strace))
+
+    baseline = None
+    if arguments.compare:
+        with open(arguments.compare) as f:
+            baseline = json.load(f)
+    regressed = report(results, baseline, arguments.threshold)
+    if arguments.json:
+        with open(arguments.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if regressed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Value-to-color thresholds shared by sys-mon, weather and network-info.
+
+Every scale is a list of (upper bound, color) steps in ascending order, the
+last bound None for everything above. A value takes the color of the first
+step whose bound it does not exceed, found with bisect over the compiled
+bounds. Steps are continuous, so no value can fall between two ranges.
+
+Scales can be overridden from a theme file, read once per process:
+$WAYBAR_COLORS or $XDG_CONFIG_HOME/waybar/colors.json, e.g.
+
+    {"cpu_gpu_temp": [[40, "#a6e3a1"], [70, "#f9e2af"], [null, "#f38ba8"]]}
+
+    colors.py   prints the scales in effect
+"""
+import bisect
+import json
+import os
+
+from paths import CONFIG_DIR
+
+THEME_FILE = os.environ.get("WAYBAR_COLORS") or os.path.join(CONFIG_DIR, "colors.json")
+
+HEAT = ["#8caaee", "#99d1db", "#81c8be", "#e5c890", "#ef9f76", "#ea999c", "#e78284"]  # Cool to hot
+
+SCALES = {
+    "cpu_gpu_temp": list(zip([25, 30, 45, 60, 75, 85, None], HEAT)),
+    "cpu_power": list(zip([20, 40, 60, 80, 100, 120, None], HEAT)),
+    "gpu_power": list(zip([50, 100, 200, 300, 400, 450, None], HEAT)),
+    "mem_storage": list(zip([10, 20, 40, 60, 80, 90, None], HEAT)),
+    "weather_temp": [
+        (15, "#8caaee"), (18, "#85c1dc"), (21, "#99d1db"), (24, "#81c8be"),
+        (27, "#a6d189"), (30, "#e5c890"), (32, "#ef9f76"), (33, "#ea999c"), (None, "#e78284")
+    ],
+    "net_speed": [  # Bytes per second
+        (100 * 1024, "#61d261"), (1024 * 1024, "#5fd7ff"), (10 * 1024 * 1024, "#ffaf00"), (None, "#ff5f5f")
+    ],
+    "disk_io": list(zip([v * 1024 * 1024 for v in (1, 10, 50, 100, 250, 500)] + [None], HEAT)),  # Bytes per second
+}
+
+_compiled = None  # name -> (bounds, colors)
+
+def compile_scale(steps):
+    bounds = [float(bound) for bound, _ in steps if bound is not None]
+    colors = [color for _, color in steps]
+    if bounds != sorted(bounds) or not colors:
+        raise ValueError("Color steps must be in ascending order")
+    if len(colors) == len(bounds):
+        colors.append(colors[-1])  # No open-ended step: above the last bound keeps its color
+    return bounds, colors[:len(bounds) + 1]
+
+def load():
+    global _compiled
+    scales = dict(SCALES)
+    try:
+        with open(THEME_FILE) as f:
+            scales.update(json.load(f))
+    except:
+        pass
+    _compiled = {}
+    for name, steps in scales.items():
+        try:
+            _compiled[name] = compile_scale(steps)
+        except:
+            if name in SCALES:
+                _compiled[name] = compile_scale(SCALES[name])
+    return _compiled
+
+def color(value, scale):
+    bounds, colors = (_compiled or load())[scale]
+    return colors[bisect.bisect_left(bounds, value)]
+
+if __name__ == "__main__":
+    for name, (bounds, colors) in load().items():
+        print(f"{name}: " + " ".join(f"{c} ≤{b:.10g}" for b, c in zip(bounds, colors)) + f" {colors[-1]}")
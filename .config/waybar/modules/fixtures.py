@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""Recorded /sys and /proc trees and stub tools for running the modules off-box.
+
+Each fixture is a dict of relative path -> file content, written out under a
+root that the modules pick up through WAYBAR_FS_ROOT. Stub binaries go into
+<root>/bin for PATH. Used by bench.py; can also be built by hand:
+
+    fixtures.py NAME DEST     writes fixture NAME to DEST and prints the env to use
+"""
+import os
+import stat
+import sys
+import time
+
+# ---------------------------
+# SHARED /proc
+# ---------------------------
+MEMINFO = """\
+MemTotal:       32768000 kB
+MemFree:        12000000 kB
+MemAvailable:   22000000 kB
+Buffers:          400000 kB
+Cached:          9000000 kB
+SwapCached:            0 kB
+Active:         10000000 kB
+Inactive:        6000000 kB
+Active(file):    4000000 kB
+Inactive(file):  4500000 kB
+Shmem:            600000 kB
+SReclaimable:     700000 kB
+Slab:            1000000 kB
+SwapTotal:       8000000 kB
+SwapFree:        8000000 kB
+"""
+
+MOUNTINFO = """\
+24 1 259:2 / / rw,relatime shared:1 - btrfs /dev/nvme0n1p2 rw,ssd
+25 24 259:1 / /boot rw,relatime shared:2 - vfat /dev/nvme0n1p1 rw
+26 24 259:5 / /mnt/games rw,relatime shared:3 - ext4 /dev/nvme1n1p1 rw
+29 24 0:35 /@home /home rw,relatime shared:6 - btrfs /dev/nvme0n1p2 rw,ssd,subvol=/@home
+27 24 0:22 / /proc rw,nosuid,nodev,noexec,relatime shared:4 - proc proc rw
+28 24 0:30 / /tmp rw,nosuid,nodev shared:5 - tmpfs tmpfs rw
+"""
+
+DISKSTATS = """\
+ 259       0 nvme0n1 120000 3000 9600000 40000 80000 5000 6400000 90000 0 60000 130000 0 0 0 0 0 0
+ 259       1 nvme0n1p1 300 0 24000 100 10 0 80 5 0 80 105 0 0 0 0 0 0
+ 259       2 nvme0n1p2 119000 3000 9570000 39800 79990 5000 6399920 89995 0 59900 129795 0 0 0 0 0 0
+ 259       4 nvme1n1 50000 100 4000000 20000 1000 10 80000 3000 0 15000 23000 0 0 0 0 0 0
+ 259       5 nvme1n1p1 49900 100 3990000 19990 1000 10 80000 3000 0 14990 22990 0 0 0 0 0 0
+"""
+
+def route_table(*routes):
+    """/proc/net/route with (interface, destination hex, gateway hex) rows."""
+    lines = ["Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT"]
+    for name, destination, gateway in routes:
+        mask = "00000000" if destination == "00000000" else "00FFFFFF"
+        lines.append(f"{name}\t{destination}\t{gateway}\t0003\t0\t0\t100\t{mask}\t0\t0\t0")
+    return "\n".join(lines) + "\n"
+
+def nic(name, operstate="up", physical=True, rx=123456789, tx=23456789):
+    files = {
+        f"sys/class/net/{name}/operstate": operstate + "\n",
+        f"sys/class/net/{name}/statistics/rx_bytes": f"{rx}\n",
+        f"sys/class/net/{name}/statistics/tx_bytes": f"{tx}\n",
+    }
+    if physical:
+        files[f"sys/class/net/{name}/device/uevent"] = "DRIVER=r8169\n"
+    return files
+
+COMMON = {
+    "proc/stat": "cpu  470500 1500 112000 1625000 5200 0 2000 0 0 0\n"
+                 "cpu0 58000 200 14000 203000 650 0 250 0 0 0\n"
+                 "intr 0\nctxt 1000\nbtime 1700000000\nprocesses 1000\nprocs_running 2\nprocs_blocked 0\n",
+    "proc/meminfo": MEMINFO,
+    "proc/cpuinfo": "processor\t: 0\nmodel name\t: AMD Ryzen 7 5800X3D 8-Core Processor\ncpu MHz\t\t: 3400.000\n\n",
+    "proc/filesystems": "nodev\tsysfs\nnodev\tproc\nnodev\ttmpfs\n\text4\n\tbtrfs\n\tvfat\n",
+    "proc/self/mountinfo": MOUNTINFO,
+    "proc/diskstats": DISKSTATS,
+    "proc/sys/kernel/random/boot_id": "4f0c2d9e-6f1a-4c55-9a77-0b8e1f3c2a10\n",
+    "proc/net/route": route_table(("enp42s0", "00000000", "0101A8C0"), ("enp42s0", "0001A8C0", "00000000")),
+    "dev/disk/by-uuid/5b7e0f3c-1d2a-4e8b-9c6f-2a1b3c4d5e6f": "../../nvme0n1p2",
+    "dev/disk/by-uuid/7c1d-22ab": "../../nvme0n1p1",
+    "dev/disk/by-uuid/a3f9e8d7-c6b5-4a39-8271-605f4e3d2c1b": "../../nvme1n1p1",
+    "dev/disk/by-label/Omarchy": "../../nvme0n1p2",
+    "dev/disk/by-label/Games": "../../nvme1n1p1",
+    **nic("lo", "unknown", physical=False),
+    **nic("enp42s0"),
+}
+
+# ---------------------------
+# MACHINES
+# ---------------------------
+def hwmon(index, name, **attributes):
+    files = {f"sys/class/hwmon/hwmon{index}/name": name + "\n"}
+    for attribute, value in attributes.items():
+        files[f"sys/class/hwmon/hwmon{index}/{attribute}"] = f"{value}\n"
+    return files
+
+AMDGPU_CARD = "sys/class/drm/card0/device"
+
+FIXTURES = {
+    # Ryzen desktop: k10temp, nct6687 Super I/O power, DIMM sensors and an amdgpu card
+    "amd-nct6687": {
+        **COMMON,
+        **hwmon(0, "k10temp", temp1_input=48250, temp3_input=51000),
+        **hwmon(1, "nct6687", power1_input=65300000, power2_input=4000000),
+        **hwmon(2, "dimm_temp", temp1_input=41000),
+        **hwmon(3, "dimm_temp", temp1_input=42500),
+        f"{AMDGPU_CARD}/vendor": "0x1002\n",
+        f"{AMDGPU_CARD}/gpu_busy_percent": "37\n",
+        f"{AMDGPU_CARD}/pp_dpm_sclk": "0: 500Mhz\n1: 1850Mhz *\n2: 2525Mhz\n",
+        f"{AMDGPU_CARD}/hwmon/hwmon4/name": "amdgpu\n",
+        f"{AMDGPU_CARD}/hwmon/hwmon4/temp1_input": "55000\n",
+        f"{AMDGPU_CARD}/hwmon/hwmon4/power1_average": "182000000\n",
+    },
+    # Intel laptop: coretemp, RAPL energy counter, NVIDIA card reached through nvidia-smi
+    "intel-rapl": {
+        **COMMON,
+        **hwmon(0, "coretemp", temp1_input=62000),
+        "sys/class/powercap/intel-rapl:0/energy_uj": "123456789012\n",
+        "sys/class/powercap/intel-rapl:0/max_energy_range_uj": "262143328850\n",
+        "sys/class/drm/card0/device/vendor": "0x10de\n",
+    },
+    # Ethernet, Wi-Fi, a WireGuard tunnel, a bridge and a down port
+    "multi-nic": {
+        **COMMON,
+        **hwmon(0, "k10temp", temp1_input=45000),
+        **nic("wlan0", rx=987654321, tx=87654321),
+        **nic("wg0", "unknown", physical=False, rx=5555555, tx=4444444),
+        **nic("docker0", physical=False, rx=100, tx=200),
+        **nic("enp5s0", "down"),
+        "proc/net/route": route_table(("enp42s0", "00000000", "0101A8C0"), ("wlan0", "00000000", "0101A8C0"),
+                                      ("wg0", "0000080A", "00000000")),
+    },
+}
+
+# ---------------------------
+# RECORDED TOOL OUTPUT
+# ---------------------------
+# nvidia-smi -i 0 --query-gpu=<sys-mon NVIDIA_FIELDS> --format=csv,noheader,nounits
+NVIDIA_CSV = {
+    "rtx4070": "NVIDIA GeForce RTX 4070, 54, 87.32, 41, 2310, 3105\n",
+    "not-available": "NVIDIA GeForce GTX 1650, 47, [N/A], 3, 300, 2100\n",
+    "not-supported": "Tesla K80, 38, 26.14, [Not Supported], [Not Supported], 875\n",
+    "comma-name": "NVIDIA RTX A2000 8GB Laptop GPU, Max-Q, 61, 35.10, 88, 1597, 2100\n",
+    "quoted-name": '"NVIDIA RTX A2000 8GB Laptop GPU, Max-Q", 61, 35.10, 88, 1597, 2100\n',
+    "truncated": "NVIDIA GeForce RTX 4070, 54, 87.3\n",
+    "truncated-comma-name": "NVIDIA RTX A2000 8GB Laptop GPU, Max-Q, 61, 35.10, 88, 15\n",
+}
+# The same query with --loop-ms=1000: one row per interval, cut off mid-row when killed
+NVIDIA_LOOP = (
+    "NVIDIA GeForce RTX 4070, 54, 87.32, 41, 2310, 3105\n"
+    "NVIDIA GeForce RTX 4070, 55, 142.80, 97, 2655, 3105\n"
+    "\n"
+    "NVIDIA GeForce RTX 4070, 56, 151.06, 99, 2670, 3105\n"
+    "NVIDIA GeForce RTX 4070, 56, 15"
+)
+
+# ---------------------------
+# STUB TOOLS
+# ---------------------------
+STUBS = {
+    # Same output shape as the real tools, instantly
+    "rocm-smi": """#!/bin/sh
+cat <<'EOF'
+GPU[0]\t\t: GPU use (%): 37
+GPU[0]\t\t: Average Graphics Package Power (W): 182.0
+GPU[0]\t\t: Temperature (Sensor edge) (C): 55.0
+GPU[0]\t\t: sclk clock level: 1: (1850Mhz) *
+GPU[0]\t\t: 2: 2525Mhz
+EOF
+""",
+    "nvidia-smi": """#!/bin/sh
+line="NVIDIA GeForce RTX 4070, 54, 87.32, 41, 2310, 3105"
+for arg in "$@"; do
+    case "$arg" in
+        --loop-ms=*) ms=${arg#--loop-ms=} ;;
+    esac
+done
+if [ -z "$ms" ]; then echo "$line"; exit 0; fi
+while :; do echo "$line"; sleep "$(awk "BEGIN { print $ms / 1000 }")"; done
+""",
+    # Nothing may signal the real waybar during a benchmark
+    "pkill": "#!/bin/sh\nexit 0\n",
+}
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+def build(name, root):
+    """Write fixture `name` and the stub tools under root."""
+    for rel, content in FIXTURES[name].items():
+        path = os.path.join(root, rel)
+        if rel.startswith("dev/disk/"):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if not os.path.lexists(path):
+                os.symlink(content, path)
+        else:
+            write_file(path, content)
+    # sysfs exposes every hwmon chip under /sys/class/hwmon too
+    card_hwmon = os.path.join(root, AMDGPU_CARD, "hwmon")
+    if os.path.isdir(card_hwmon):
+        for entry in os.listdir(card_hwmon):
+            link = os.path.join(root, "sys/class/hwmon", entry)
+            if not os.path.lexists(link):
+                os.symlink(os.path.join(card_hwmon, entry), link)
+
+    for tool, script in STUBS.items():
+        path = os.path.join(root, "bin", tool)
+        write_file(path, script)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return root
+
+# ---------------------------
+# NETWORK FIXTURES
+# ---------------------------
+IPINFO = {"ip": "203.0.113.7", "loc": "59.91,10.75", "city": "Oslo"}
+
+def forecast(days=4):
+    """An Open-Meteo answer starting today, so the hourly index lines up with the clock."""
+    start = time.localtime()
+    start = time.mktime((start.tm_year, start.tm_mon, start.tm_mday, 0, 0, 0, 0, 0, -1))
+    hours = [time.strftime("%Y-%m-%dT%H:%M", time.localtime(start + h * 3600)) for h in range(days * 24)]
+    n = len(hours)
+    return {
+        "current_weather": {"temperature": 12.3, "weathercode": 61},
+        "hourly": {
+            "time": hours,
+            "temperature_2m": [10 + i % 7 for i in range(n)],
+            "apparent_temperature": [9 + i % 5 for i in range(n)],
+            "weathercode": [[0, 2, 61, 3][i % 4] for i in range(n)],
+            "relativehumidity_2m": [70] * n,
+            "windspeed_10m": [11] * n,
+            "precipitation_probability": [(i * 13) % 100 for i in range(n)],
+            "precipitation": [0.1 * (i % 3) for i in range(n)],
+        },
+        "daily": {
+            "time": [time.strftime("%Y-%m-%d", time.localtime(start + d * 86400)) for d in range(days)],
+            "temperature_2m_max": [15, 16, 17, 18][:days],
+            "temperature_2m_min": [5, 6, 7, 8][:days],
+            "weathercode": [0, 3, 61, 95][:days],
+        },
+    }
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in FIXTURES:
+        sys.exit(f"usage: fixtures.py {{{','.join(FIXTURES)}}} DEST")
+    root = os.path.abspath(build(sys.argv[1], sys.argv[2]))
+    print(f"export WAYBAR_FS_ROOT={root} PATH={root}/bin:$PATH")
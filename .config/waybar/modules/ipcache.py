@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Shared public IP / geolocation cache for the waybar modules.
+
+network-info.py and weather.py both need to know where we are on the
+internet. One ipinfo.io lookup answers both, and the result is kept in
+$XDG_CACHE_HOME/waybar/ipinfo.json so every module (and every process)
+shares it:
+
+- Stale values are served immediately while a refresh runs in the background.
+- Refreshes are single-flight: an flock on the cache's lock file makes sure
+  concurrent invocations never fetch at the same time.
+- Failures are cached too, with exponential backoff, so an offline machine
+  does not retry on every tick.
+"""
+import json
+import os
+import sys
+import time
+import fcntl
+
+import stats
+from paths import CACHE_DIR, atomic_write
+
+IPINFO_URL = os.environ.get("WAYBAR_IPINFO_URL", "https://ipinfo.io/json")
+CACHE_FILE = os.path.join(CACHE_DIR, "ipinfo.json")
+LOCK_FILE = CACHE_FILE + ".lock"
+CACHE_DURATION = 300  # Seconds before a lookup is revalidated
+FETCH_TIMEOUT = 3
+BACKOFF_BASE = 30  # First retry delay after a failure, doubled per failure
+BACKOFF_MAX = 1800
+
+_memo = {}  # Last entry read by this process, saves re-reading a fresh cache file
+_inflight = None  # Background refresh thread of a resident process
+
+def read_cache():
+    try:
+        with open(CACHE_FILE) as f:
+            return json.load(f)
+    except:
+        return {}
+
+def write_cache(entry):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    atomic_write(CACHE_FILE, json.dumps(entry))
+
+def is_fresh(entry, max_age):
+    return time.time() - entry.get("fetched", 0) < max_age
+
+def in_backoff(entry):
+    return time.time() < entry.get("retry_after", 0)
+
+def backoff(entry):
+    """entry after one more failed fetch: its value kept, the next retry pushed out."""
+    failures = entry.get("failures", 0) + 1
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (failures - 1))
+    return dict(entry, failures=failures, retry_after=time.time() + delay)
+
+def fetch(url=IPINFO_URL, timeout=FETCH_TIMEOUT):
+    import urllib.request  # Costs more than the rest of the module, only needed on a refresh
+    with urllib.request.urlopen(url, timeout=timeout) as r:
+        return json.load(r)
+
+def wait_for_lock(lock, timeout):
+    """flock(LOCK_EX) giving up after timeout seconds; flock itself has no timeout."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+def refresh(max_age=CACHE_DURATION, url=IPINFO_URL, timeout=FETCH_TIMEOUT, block=False):
+    """Fetch a new lookup unless another process already is. Returns True if this call fetched.
+
+    With block=True a fetch already running elsewhere is waited for (up to its
+    timeout) instead of skipped, so its result can be read from the cache.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(LOCK_FILE, "w") as lock:
+        if not wait_for_lock(lock, timeout + 1 if block else 0):
+            return False  # Someone else is fetching, their result lands in the cache
+
+        # The previous lock holder may have just finished
+        entry = read_cache()
+        if (entry.get("data") and is_fresh(entry, max_age)) or in_backoff(entry):
+            return False
+
+        try:
+            data = stats.timed("ipinfo", fetch)(url, timeout)
+            entry = {"data": data, "fetched": time.time()}
+        except Exception:
+            # Keep serving the old value, retry later with exponential backoff
+            entry = backoff(entry)
+        write_cache(entry)
+        return True
+
+def revalidate(max_age, resident):
+    global _inflight
+    import subprocess
+    import threading
+    if resident:
+        if _inflight is None or not _inflight.is_alive():
+            _inflight = threading.Thread(target=refresh, args=(max_age,), daemon=True)
+            _inflight.start()
+    else:
+        # A short-lived script must not wait for the fetch before exiting
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "--refresh", str(max_age)],
+                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, start_new_session=True)
+
+def lookup(max_age=CACHE_DURATION, block=False, resident=False):
+    """Return the cached ipinfo dict (may be stale or None) and revalidate it if needed.
+
+    With block=True and nothing cached yet the first fetch happens inline, or
+    is waited for if another process or thread is already making it.
+    resident=True refreshes in a thread instead of a detached process.
+    """
+    global _memo
+    if _memo.get("data") and is_fresh(_memo, max_age):
+        return _memo["data"]
+    entry = _memo = read_cache()
+    data = entry.get("data")
+    if data and is_fresh(entry, max_age):
+        return data
+    if in_backoff(entry):
+        return data
+    if data is None and block:
+        refresh(max_age, block=True)
+        _memo = read_cache()
+        return _memo.get("data")
+    revalidate(max_age, resident)
+    return data
+
+def get_external_ip(**kwargs):
+    data = lookup(**kwargs)
+    return data.get("ip", "N/A") if data else "N/A"
+
+def get_location(**kwargs):
+    """(lat, lon, city), or None if the location is unknown."""
+    data = lookup(**kwargs)
+    try:
+        lat, lon = data["loc"].split(",")
+        return float(lat), float(lon), data.get("city", "Your Location")
+    except:
+        return None
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--refresh"]:
+        refresh(float(sys.argv[2]) if len(sys.argv) > 2 else CACHE_DURATION)
+    else:
+        print(json.dumps(lookup(block=True)))
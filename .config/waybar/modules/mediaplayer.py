@@ -9,18 +9,83 @@ import sys
 import signal
 import json
 import os
+import time
 from typing import List
 
+from paths import RUNTIME_DIR, atomic_symlink
+
 logger = logging.getLogger(__name__)
 
+DEBOUNCE_MS = 100  # Bursts of signals within this window produce a single line
+POSITION_INTERVAL = 1.0  # Seconds between progress updates with --position
+PROGRESS_WIDTH = 20
+# --album-art keeps this symlink pointing at the shown track's thumbnail and
+# signals waybar's image#album-art module to reload it
+ART_LINK = os.path.join(RUNTIME_DIR, "waybar-album-art.png")
+ART_SIGNAL = 13
+
 def signal_handler(sig, frame):
     logger.info("Received signal to stop, exiting")
     sys.stdout.write("\n")
     sys.stdout.flush()
     sys.exit(0)
 
+def parse_metadata(metadata):
+    """(artist, title, trackid, length in µs, art URL) from the metadata variant a signal delivered."""
+    try:
+        data = metadata.unpack()
+    except AttributeError:
+        data = dict(metadata or {})
+    artist = data.get("xesam:artist") or ""
+    if isinstance(artist, (list, tuple)):
+        artist = ", ".join(artist)
+    return (artist, data.get("xesam:title") or "", str(data.get("mpris:trackid") or ""),
+            int(data.get("mpris:length") or 0), data.get("mpris:artUrl") or "")
+
+def format_time(us):
+    seconds = int(us / 1000000)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+class PlayerState:
+    """What we know about one player, kept current from its own signals so
+    handling an event never has to query any player over D-Bus."""
+
+    def __init__(self, player):
+        self.player = player
+        self.name = player.props.player_name
+        self.playing = player.props.status == "Playing"
+        self.artist, self.title, self.trackid, self.length, self.art_url = parse_metadata(player.props.metadata)
+        # Position is read once; after that it is interpolated from a local
+        # clock and corrected by Seeked signals, never polled
+        try:
+            self.position = player.props.position
+        except:
+            self.position = 0
+        self.anchor = time.monotonic()
+
+    def elapsed(self):
+        if self.playing:
+            return self.position + (time.monotonic() - self.anchor) * 1000000
+        return self.position
+
+    def set_playing(self, playing):
+        self.position = self.elapsed()
+        self.anchor = time.monotonic()
+        self.playing = playing
+
+    def seek(self, position):
+        self.position = position
+        self.anchor = time.monotonic()
+
+    def set_metadata(self, metadata):
+        trackid = self.trackid
+        self.artist, self.title, self.trackid, self.length, self.art_url = parse_metadata(metadata)
+        if self.trackid != trackid:
+            self.seek(0)
+
 class PlayerManager:
-    def __init__(self, selected_player=None, excluded_player=[]):
+    def __init__(self, selected_player=None, excluded_player=[], output=None, debounce=DEBOUNCE_MS,
+                 position_interval=None, album_art=False):
         self.manager = Playerctl.PlayerManager()
         self.loop = GLib.MainLoop()
         self.manager.connect(
@@ -28,9 +93,23 @@ class PlayerManager:
         self.manager.connect(
             "player-vanished", lambda *args: self.on_player_vanished(*args))
 
-        signal.signal(signal.SIGINT, signal_handler)
-        signal.signal(signal.SIGTERM, signal_handler)
-        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+        # When hosted by waybar-py.py the manager runs in a worker thread and
+        # lines go to `output` instead of stdout; signals belong to the host then.
+        self.output = output
+        self.debounce = debounce
+        self.pending = None
+        self.flush_source = None
+        self.last_line = None
+        # Progress updates run on a timer only while the shown player is playing
+        self.position_interval = position_interval
+        self.ticker = None
+        self.album_art = album_art
+        self.art_url = None
+        if output is None:
+            signal.signal(signal.SIGINT, signal_handler)
+            signal.signal(signal.SIGTERM, signal_handler)
+            signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+        self.states = {}  # Player instance name -> PlayerState, in the order they appeared
         self.selected_player = selected_player
         self.excluded_player = excluded_player.split(',') if excluded_player else []
 
@@ -55,60 +134,170 @@ class PlayerManager:
         player.connect("playback-status",
                        self.on_playback_status_changed, None)
         player.connect("metadata", self.on_metadata_changed, None)
+        if self.position_interval:
+            player.connect("seeked", self.on_seeked, None)
         self.manager.manage_player(player)
-        self.on_metadata_changed(player, player.props.metadata)
+        # The only time player properties are read; signals keep the state current after this
+        self.states[player.props.player_instance] = PlayerState(player)
+        self.show_most_important_player()
 
     def get_players(self) -> List[Player]:
         return self.manager.props.players
 
-    def write_output(self, text, player):
+    def write_output(self, text, player_name, state=None):
         logger.debug(f"Writing output: {text}")
 
         output = {"text": text,
-                  "class": "custom-" + player.props.player_name,
-                  "alt": player.props.player_name}
+                  "class": "custom-" + player_name,
+                  "alt": player_name}
+        if state is not None and text and state.length:
+            elapsed = min(state.elapsed(), state.length)
+            percentage = int(elapsed * 100 / state.length)
+            filled = percentage * PROGRESS_WIDTH // 100
+            output["text"] += f"  {format_time(elapsed)} / {format_time(state.length)}"
+            output["percentage"] = percentage
+            output["tooltip"] = "━" * filled + "●" + "─" * (PROGRESS_WIDTH - filled)
 
-        sys.stdout.write(json.dumps(output) + "\n")
-        sys.stdout.flush()
+        self.emit(json.dumps(output))
 
     def clear_output(self):
-        sys.stdout.write("\n")
-        sys.stdout.flush()
+        self.emit("")
+
+    def emit(self, line):
+        # Spotify sends several metadata and status signals per track change;
+        # only the state after the burst is written, and only if it changed.
+        self.pending = line
+        if self.debounce <= 0:
+            self.flush()
+        elif self.flush_source is None:
+            self.flush_source = GLib.timeout_add(self.debounce, self.flush)
+
+    def flush(self):
+        self.flush_source = None
+        line, self.pending = self.pending, None
+        if line is None or line == self.last_line:
+            return False
+        self.last_line = line
+        logger.debug(f"Flushing output: {line}")
+        if self.output is not None:
+            self.output(line)
+        else:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+        return False  # One-shot GLib timeout
 
     def on_playback_status_changed(self, player, status, _=None):
         logger.debug(f"Playback status changed for player {player.props.player_name}: {status}")
-        self.on_metadata_changed(player, player.props.metadata)
+        state = self.states.get(player.props.player_instance)
+        if state is not None:
+            state.set_playing(status == Playerctl.PlaybackStatus.PLAYING)
+        self.show_most_important_player()
 
     def get_first_playing_player(self):
-        players = self.get_players()
-        logger.debug(f"Getting first playing player from {len(players)} players")
-        if len(players) > 0:
-            for player in players[::-1]:
-                if player.props.status == "Playing":
-                    return player
-            return players[0]
+        """Newest playing player, else the oldest one, decided from the state table."""
+        states = list(self.states.values())
+        logger.debug(f"Getting first playing player from {len(states)} players")
+        if len(states) > 0:
+            for state in states[::-1]:
+                if state.playing:
+                    return state
+            return states[0]
         else:
             logger.debug("No players found")
             return None
 
     def show_most_important_player(self):
         logger.debug("Showing most important player")
-        current_player = self.get_first_playing_player()
-        if current_player is not None:
-            self.on_metadata_changed(current_player, current_player.props.metadata)
-        else:    
+        current = self.get_first_playing_player()
+        if current is not None:
+            self.write_output(self.format_track(current), current.name,
+                              current if self.position_interval else None)
+        else:
             self.clear_output()
+        self.update_ticker(current)
+        if self.album_art:
+            self.update_art(current)
+
+    def update_ticker(self, current):
+        playing = self.position_interval and current is not None and current.playing
+        if playing and self.ticker is None:
+            self.ticker = GLib.timeout_add(int(self.position_interval * 1000), self.on_tick)
+        elif not playing and self.ticker is not None:
+            GLib.source_remove(self.ticker)
+            self.ticker = None
+
+    def on_tick(self):
+        current = self.get_first_playing_player()
+        if current is None or not current.playing:
+            self.ticker = None
+            return False  # Paused: no output at all until playback resumes
+        self.show_most_important_player()
+        return True
+
+    def update_art(self, current):
+        url = current.art_url if current is not None else ""
+        if url == self.art_url:
+            return
+        self.art_url = url
+        if not url:
+            self.show_art(None)
+            return
+
+        import albumart
+        path = albumart.lookup(url)
+        if path:
+            self.show_art(path)
+            return
+
+        # Fetching and scaling must not block the GLib loop
+        import threading
+        def fetch():
+            try:
+                path = albumart.thumbnail(url)
+            except Exception as e:
+                logger.warning(f"Album art unavailable for {url}: {e}")
+                path = None
+            GLib.idle_add(self.on_art_ready, url, path)
+        threading.Thread(target=fetch, daemon=True).start()
+
+    def on_art_ready(self, url, path):
+        if url == self.art_url:  # Still the shown track
+            self.show_art(path)
+        return False
+
+    def show_art(self, path):
+        try:
+            if path:
+                atomic_symlink(path, ART_LINK)
+            elif os.path.lexists(ART_LINK):
+                os.unlink(ART_LINK)
+        except OSError as e:
+            logger.warning(f"Could not update {ART_LINK}: {e}")
+            return
+        import subprocess
+        subprocess.run(["pkill", f"-RTMIN+{ART_SIGNAL}", "-x", "waybar"],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def on_seeked(self, player, position, _=None):
+        logger.debug(f"Player {player.props.player_name} seeked to {position}")
+        state = self.states.get(player.props.player_instance)
+        if state is not None:
+            state.seek(position)
+            self.show_most_important_player()
 
     def on_metadata_changed(self, player, metadata, _=None):
         logger.debug(f"Metadata changed for player {player.props.player_name}")
-        player_name = player.props.player_name
-        artist = player.get_artist()
-        artist = artist.replace("&", "&amp;") if artist else ""
-        title = player.get_title()
-        title = title.replace("&", "&amp;") if title else ""
+        state = self.states.get(player.props.player_instance)
+        if state is not None:
+            state.set_metadata(metadata)
+        self.show_most_important_player()
+
+    def format_track(self, state):
+        artist = state.artist.replace("&", "&amp;")
+        title = state.title.replace("&", "&amp;")
 
         track_info = ""
-        if player_name == "spotify" and "mpris:trackid" in metadata.keys() and ":ad:" in player.props.metadata["mpris:trackid"]:
+        if state.name == "spotify" and ":ad:" in state.trackid:
             track_info = "Advertisement"
         elif artist and title:
             track_info = f"{artist} - {title}"
@@ -117,16 +306,11 @@ class PlayerManager:
 
         if track_info:
             # ✅ Inverted play/pause symbols here
-            if player.props.status == "Playing":
+            if state.playing:
                 track_info = " " + track_info  # Pause symbol when playing
             else:
                 track_info = " " + track_info  # Play symbol when paused
-
-        current_playing = self.get_first_playing_player()
-        if current_playing is None or current_playing.props.player_name == player.props.player_name:
-            self.write_output(track_info, player)
-        else:
-            logger.debug(f"Other player {current_playing.props.player_name} is playing, skipping")
+        return track_info
 
     def on_player_appeared(self, _, player):
         logger.info(f"Player has appeared: {player.name}")
@@ -142,6 +326,7 @@ class PlayerManager:
 
     def on_player_vanished(self, _, player):
         logger.info(f"Player {player.props.player_name} has vanished")
+        self.states.pop(player.props.player_instance, None)
         self.show_most_important_player()
 
 def parse_arguments():
@@ -150,6 +335,14 @@ def parse_arguments():
     parser.add_argument("-x", "--exclude", "- Comma-separated list of excluded player")
     parser.add_argument("--player")
     parser.add_argument("--enable-logging", action="store_true")
+    parser.add_argument("--debounce", type=int, default=DEBOUNCE_MS,
+                        help="Milliseconds to coalesce bursts of player signals (0 to disable)")
+    parser.add_argument("--position", action="store_true",
+                        help="Show elapsed time and a progress bar while playing")
+    parser.add_argument("--position-interval", type=float, default=POSITION_INTERVAL,
+                        help="Seconds between progress updates with --position")
+    parser.add_argument("--album-art", action="store_true",
+                        help="Keep the shown track's art thumbnail at " + ART_LINK)
     return parser.parse_args()
 
 def main():
@@ -165,7 +358,9 @@ def main():
         logger.info(f"Filtering for player: {arguments.player}")
     if arguments.exclude:
         logger.info(f"Exclude player {arguments.exclude}")
-    player = PlayerManager(arguments.player, arguments.exclude)
+    player = PlayerManager(arguments.player, arguments.exclude, debounce=arguments.debounce,
+                           position_interval=arguments.position_interval if arguments.position else None,
+                           album_art=arguments.album_art)
     player.run()
 
 if __name__ == "__main__":
@@ -1,69 +1,210 @@
 #!/usr/bin/env python3
+# Cold-start budget: 100 ms to the first JSON line (check with --profile-startup).
+# The external IP comes from ipcache, which only imports urllib when it has to fetch.
 import json
+import math
+import os
 import time
-import subprocess
-import requests
 import sys
-from pathlib import Path
+import argparse
+import errno
+import fcntl
+import select
+import socket
+import struct
+from collections import deque
+
+import colors
+import ipcache
+import stats
 
 # Configuration
-INTERFACE = "enp42s0"  # Change to your network interface (e.g., eth0, enp0s3, wlp2s0)
-CACHE_FILE = "/tmp/waybar_net_cache"
-CACHE_DURATION = 300  # Cache external IP for 5 minutes
+INTERFACE = None  # None = auto-detect, or pin one interface (e.g., eth0, enp0s3, wlp2s0)
+VPN_PREFIXES = ("wg", "tun", "tap", "tailscale", "ppp")  # Virtual links that still count as active
+FS_ROOT = os.environ.get("WAYBAR_FS_ROOT", "")  # Prefix for /sys and /proc, for fixture trees
+NET_DIR = FS_ROOT + "/sys/class/net"
+CACHE_DURATION = 300  # Revalidate the external IP after 5 minutes
+REFRESH_INTERVAL = 2  # Seconds between updates (sub-second values are fine)
+HISTORY_SIZE = 30  # Samples kept for the peak rate
+SMOOTHING = 5  # EWMA time constant in seconds
+STARTUP_BUDGET_MS = 100
+STATS = ("counters", "interfaces", "local_ip", "ipinfo")  # Shown in the tooltip with --stats
+
+# Kernel interfaces used for interface discovery and the local address
+SIOCGIFADDR = 0x8915
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTM_NEWLINK, RTM_DELLINK = 16, 17
+RTM_NEWADDR, RTM_DELADDR = 20, 21
+RTM_NEWROUTE, RTM_DELROUTE = 24, 25
+NLMSG_HEADER = struct.Struct("=LHHLL")  # len, type, flags, seq, pid
+IFADDRMSG = struct.Struct("=BBBBI")  # family, prefixlen, flags, scope, index
+NETLINK_RCVBUF = 1024 * 1024  # Room for a burst of container link events
+
+def read_text(path):
+    # Plain open() instead of pathlib, which drags urllib into every cold start
+    with open(path) as f:
+        return f.read()
 
 def get_bytes(interface):
     """Get current transmitted and received bytes for interface"""
     try:
-        rx_bytes = int(Path(f"/sys/class/net/{interface}/statistics/rx_bytes").read_text())
-        tx_bytes = int(Path(f"/sys/class/net/{interface}/statistics/tx_bytes").read_text())
+        rx_bytes = int(read_text(f"{NET_DIR}/{interface}/statistics/rx_bytes"))
+        tx_bytes = int(read_text(f"{NET_DIR}/{interface}/statistics/tx_bytes"))
         return rx_bytes, tx_bytes
     except:
+        stats.failed("counters")
         return 0, 0
 
 def get_local_ip(interface):
-    """Get local IPv4 address"""
+    """Get local IPv4 address straight from the kernel (SIOCGIFADDR)"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            ifreq = struct.pack("256s", interface[:15].encode())
+            packed = fcntl.ioctl(s.fileno(), SIOCGIFADDR, ifreq)
+            return socket.inet_ntoa(packed[20:24])
+    except:
+        stats.failed("local_ip")
+        return "N/A"
+
+def default_route_interfaces():
+    """Interfaces carrying an IPv4 default route, lowest metric first"""
+    routes = []
     try:
-        result = subprocess.run(
-            ["ip", "-4", "addr", "show", interface],
-            capture_output=True,
-            text=True
-        )
-        for line in result.stdout.split('\n'):
-            if 'inet ' in line:
-                return line.strip().split()[1].split('/')[0]
+        with open(FS_ROOT + "/proc/net/route") as f:
+            next(f)  # Header
+            for line in f:
+                fields = line.split()
+                if len(fields) > 7 and fields[1] == "00000000" and fields[7] == "00000000":
+                    routes.append((int(fields[6]), fields[0]))
     except:
         pass
-    return "N/A"
+    return [name for _, name in sorted(routes)]
+
+def discover_interfaces():
+    """Return (active interfaces, primary interface) from /sys/class/net.
+
+    An interface is active when it is up and either is a physical NIC,
+    carries the default route, or is a VPN link. Bridges and veth pairs
+    from containers are skipped unless they hold the default route.
+    """
+    if INTERFACE:
+        return [INTERFACE], INTERFACE
 
-def get_external_ip():
-    """Get external IP with caching"""
+    defaults = default_route_interfaces()
+    active = []
     try:
-        cache_path = Path(CACHE_FILE)
-        if cache_path.exists():
-            cache_time = cache_path.stat().st_mtime
-            if time.time() - cache_time < CACHE_DURATION:
-                return cache_path.read_text().strip()
-        
-        # Fetch new external IP
-        response = requests.get("https://api.ipify.org", timeout=3)
-        external_ip = response.text.strip()
-        
-        # Cache the result
-        cache_path.write_text(external_ip)
-        return external_ip
+        names = sorted(os.listdir(NET_DIR))
     except:
-        return "N/A"
+        names = []
+    for name in names:
+        if name == "lo":
+            continue
+        try:
+            operstate = read_text(f"{NET_DIR}/{name}/operstate").strip()
+        except:
+            continue
+        if operstate not in ("up", "unknown"):
+            continue
+        if name in defaults or name.startswith(VPN_PREFIXES) or os.path.exists(f"{NET_DIR}/{name}/device"):
+            active.append(name)
+
+    primary = defaults[0] if defaults else (active[0] if active else None)
+    return active, primary
+
+class NetworkState:
+    """Active interfaces, the primary one and its IPv4 address.
+
+    Everything is looked up once and only rebuilt when rtnetlink reports a
+    link, route or address change, so idle ticks never scan /sys/class/net.
+    """
+
+    def __init__(self):
+        self.refresh()
+        try:
+            self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            self.sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE))
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, NETLINK_RCVBUF)
+            self.sock.setblocking(False)
+        except (OSError, AttributeError):
+            self.sock = None
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def refresh(self):
+        self.interfaces, self.primary = stats.timed("interfaces", discover_interfaces)()
+        self.refresh_address()
+
+    def refresh_address(self):
+        self.address = stats.timed("local_ip", get_local_ip)(self.primary) if self.primary else "N/A"
+        try:
+            self.index = socket.if_nametoindex(self.primary)
+        except (OSError, TypeError):
+            self.index = None
+
+    def drain(self):
+        """Read every pending netlink message and return what has to be rebuilt."""
+        links = addresses = False
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                return links, addresses
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                # The socket overran and events were lost, rebuild everything
+                links = True
+                continue
+            offset = 0
+            while offset + NLMSG_HEADER.size <= len(data):
+                length, msg_type, _, _, _ = NLMSG_HEADER.unpack_from(data, offset)
+                if length < NLMSG_HEADER.size:
+                    break
+                if msg_type in (RTM_NEWLINK, RTM_DELLINK, RTM_NEWROUTE, RTM_DELROUTE):
+                    links = True
+                elif msg_type in (RTM_NEWADDR, RTM_DELADDR):
+                    index = IFADDRMSG.unpack_from(data, offset + NLMSG_HEADER.size)[4]
+                    if self.index is None or index == self.index:
+                        addresses = True
+                offset += (length + 3) & ~3  # NLMSG_ALIGN
+
+    def wait(self, timeout):
+        """Sleep up to `timeout` seconds; return True early if anything changed."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if self.sock is None:
+                time.sleep(remaining)
+                return False
+            ready, _, _ = select.select([self.sock], [], [], remaining)
+            if not ready:
+                return False
+            if self.handle_events():
+                return True
+
+    def handle_events(self):
+        """Apply pending netlink events; True if the interfaces or address changed."""
+        links, addresses = self.drain()
+        if links:
+            self.refresh()
+        elif addresses:
+            self.refresh_address()
+        return links or addresses
+
+def get_external_ip(block=False):
+    """Get external IP from the shared cache, never waiting on the network unless block is set"""
+    return ipcache.get_external_ip(max_age=CACHE_DURATION, block=block, resident=not block)
 
 def get_speed_color(bytes_per_sec):
     """Get color based on speed"""
-    if bytes_per_sec < 1024 * 100:  # < 100 KB/s
-        return "#61d261"  # green
-    elif bytes_per_sec < 1024 * 1024:  # < 1 MB/s
-        return "#5fd7ff"  # light blue
-    elif bytes_per_sec < 1024 * 1024 * 10:  # < 10 MB/s
-        return "#ffaf00"  # orange
-    else:  # >= 10 MB/s
-        return "#ff5f5f"  # red
+    return colors.color(bytes_per_sec, "net_speed")
 
 def format_speed(bytes_per_sec):
     """Format bytes per second to human readable format with color"""
@@ -75,67 +216,160 @@ def format_speed(bytes_per_sec):
     else:
         return f'<span color="{color}">{bytes_per_sec / (1024 * 1024):.1f} MB/s</span>'
 
-def main():
-    # Handle special arguments for copying IPs
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "--local-ip":
-            print(get_local_ip(INTERFACE))
-            return
-        elif sys.argv[1] == "--external-ip":
-            print(get_external_ip())
-            return
-    
-    # Get previous values
-    try:
-        with open("/tmp/waybar_net_prev", "r") as f:
-            data = json.load(f)
-            prev_rx, prev_tx, prev_time = data["rx"], data["tx"], data["time"]
-    except:
-        prev_rx, prev_tx = get_bytes(INTERFACE)
-        prev_time = time.time()
-        # Save and output zero speeds on first run
-        with open("/tmp/waybar_net_prev", "w") as f:
-            json.dump({"rx": prev_rx, "tx": prev_tx, "time": prev_time}, f)
-        
-        output = {
-            "text": f"󰈀 ↑ 0 B/s ↓ 0 B/s",
-            "tooltip": f"<span color='#6acda2'>Local IP:</span> {get_local_ip(INTERFACE)}\n<span color='#6acda2'>External IP:</span> {get_external_ip()}\n\n🖱️ <span color='#6acda2'>LMB:</span> Copy Local IP\n🖱️ <span color='#6acda2'>RMB:</span> Copy External IP"
-        }
-        print(json.dumps(output))
-        return
+class RateTracker:
+    """Keeps the last HISTORY_SIZE counter samples in a ring buffer and derives
+    instantaneous, EWMA-smoothed and peak rates from them."""
+
+    def __init__(self, size=HISTORY_SIZE, smoothing=SMOOTHING):
+        self.samples = deque(maxlen=size)  # (time, rx_bytes, tx_bytes)
+        self.rates = deque(maxlen=size)  # (rx/s, tx/s) between consecutive samples
+        self.smoothing = smoothing
+        self.ewma = None
+
+    def add(self, now, rx, tx):
+        if self.samples:
+            prev_time, prev_rx, prev_tx = self.samples[-1]
+            elapsed = now - prev_time
+            if elapsed > 0:
+                # Counters reset when the link goes down, never report negative speeds
+                rate = (max(0, rx - prev_rx) / elapsed, max(0, tx - prev_tx) / elapsed)
+                self.rates.append(rate)
+                if self.ewma is None:
+                    self.ewma = rate
+                else:
+                    alpha = 1 - math.exp(-elapsed / self.smoothing)
+                    self.ewma = tuple(e + alpha * (r - e) for e, r in zip(self.ewma, rate))
+        self.samples.append((now, rx, tx))
+
+    def current(self):
+        return self.rates[-1] if self.rates else (0, 0)
+
+    def smoothed(self):
+        return self.ewma or (0, 0)
+
+    def peak(self):
+        if not self.rates:
+            return (0, 0)
+        return (max(r[0] for r in self.rates), max(r[1] for r in self.rates))
+
+class Throughput:
+    """A RateTracker per interface plus one for the aggregate, which is fed
+    with the summed byte deltas so interfaces coming and going cause no spikes.
+
+    VPN links only show in the per-interface breakdown: their traffic already
+    crosses the physical interface carrying the tunnel, and would count twice.
+    """
+
+    def __init__(self, history=HISTORY_SIZE):
+        self.history = history
+        self.interfaces = {}
+        self.total = RateTracker(history)
+        self.total_rx = self.total_tx = 0
+
+    def add(self, now, counters):
+        for name in list(self.interfaces):
+            if name not in counters:
+                del self.interfaces[name]
+        for name, (rx, tx) in counters.items():
+            tracker = self.interfaces.get(name)
+            if tracker is None:
+                tracker = self.interfaces[name] = RateTracker(self.history)
+            elif tracker.samples and not name.startswith(VPN_PREFIXES):
+                _, prev_rx, prev_tx = tracker.samples[-1]
+                self.total_rx += max(0, rx - prev_rx)
+                self.total_tx += max(0, tx - prev_tx)
+            tracker.add(now, rx, tx)
+        self.total.add(now, self.total_rx, self.total_tx)
+
+def build_output(throughput, network):
+    total = throughput.total
+    rx_speed, tx_speed = total.current()
+    avg_rx, avg_tx = total.smoothed()
+    peak_rx, peak_tx = total.peak()
 
-    # Get current values
-    curr_rx, curr_tx = get_bytes(INTERFACE)
-    curr_time = time.time()
-    
-    # Calculate time difference
-    time_diff = curr_time - prev_time
-    if time_diff < 0.1:
-        time_diff = 1  # Prevent division by zero
-    
-    # Calculate speeds
-    rx_speed = (curr_rx - prev_rx) / time_diff
-    tx_speed = (curr_tx - prev_tx) / time_diff
-    
-    # Ensure non-negative speeds
-    rx_speed = max(0, rx_speed)
-    tx_speed = max(0, tx_speed)
-    
-    # Save current values for next run
-    with open("/tmp/waybar_net_prev", "w") as f:
-        json.dump({"rx": curr_rx, "tx": curr_tx, "time": curr_time}, f)
-    
-    # Get IP addresses
-    local_ip = get_local_ip(INTERFACE)
     external_ip = get_external_ip()
-    
-    # Format output
-    output = {
+
+    tooltip_lines = [
+        f"<span color='#6acda2'>Local IP:</span> {network.address}" + (f" ({network.primary})" if network.primary else ""),
+        f"<span color='#6acda2'>External IP:</span> {external_ip}",
+        "",
+        f"<span color='#6acda2'>Avg:</span> ↑ {format_speed(avg_tx)} ↓ {format_speed(avg_rx)}",
+        f"<span color='#6acda2'>Peak:</span> ↑ {format_speed(peak_tx)} ↓ {format_speed(peak_rx)}",
+    ]
+    # Per-interface breakdown, only useful with more than one link
+    if len(throughput.interfaces) > 1:
+        tooltip_lines.append("")
+        for name, tracker in throughput.interfaces.items():
+            if_rx, if_tx = tracker.current()
+            tooltip_lines.append(f"<span color='#6acda2'>{name}:</span> ↑ {format_speed(if_tx)} ↓ {format_speed(if_rx)}")
+    debug = stats.tooltip_lines(STATS)
+    if debug:
+        tooltip_lines += [""] + debug
+    tooltip_lines += [
+        "",
+        "🖱️ <span color='#6acda2'>LMB:</span> Copy Local IP",
+        "🖱️ <span color='#6acda2'>RMB:</span> Copy External IP",
+    ]
+    return {
         "text": f"󰈀 ↑ {format_speed(tx_speed)} ↓ {format_speed(rx_speed)}",
-        "tooltip": f"<span color='#6acda2'>Local IP:</span> {local_ip}\n<span color='#6acda2'>External IP:</span> {external_ip}\n\n🖱️ <span color='#6acda2'>LMB:</span> Copy Local IP\n🖱️ <span color='#6acda2'>RMB:</span> Copy External IP"
+        "tooltip": "\n".join(tooltip_lines)
     }
-    
-    print(json.dumps(output))
+
+def stream(interval, history):
+    throughput = Throughput(history)
+    network = NetworkState()
+    read_counters = stats.timed("counters", lambda: {name: get_bytes(name) for name in network.interfaces})
+    next_tick = time.monotonic() + interval
+    while True:
+        counters = read_counters()
+        throughput.add(time.monotonic(), counters)
+        sys.stdout.write(json.dumps(build_output(throughput, network)) + "\n")
+        sys.stdout.flush()
+        # A link or address change wakes us up early so the tooltip updates right away
+        if not network.wait(next_tick - time.monotonic()):
+            next_tick += interval
+
+def parse_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--local-ip", action="store_true", help="Print the local IP and exit")
+    parser.add_argument("--external-ip", action="store_true", help="Print the external IP and exit")
+    parser.add_argument("--interval", type=float, default=REFRESH_INTERVAL,
+                        help="Seconds between JSON lines")
+    parser.add_argument("--history", type=int, default=HISTORY_SIZE,
+                        help="Number of samples kept for the peak rate")
+    parser.add_argument("--interface", help="Only watch this interface instead of auto-detecting")
+    parser.add_argument("--stats", action="store_true",
+                        help="Time the counter reads and lookups and show p50/p99 and errors in the tooltip")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Report import costs and time to the first JSON line, then exit")
+    return parser.parse_args()
+
+def main():
+    global INTERFACE
+    arguments = parse_arguments()
+    if arguments.profile_startup:
+        import startup
+        sys.exit(startup.profile(__file__, [a for a in sys.argv[1:] if a != "--profile-startup"],
+                                 STARTUP_BUDGET_MS))
+    if arguments.interface:
+        INTERFACE = arguments.interface
+    if arguments.stats:
+        stats.enable()
+
+    # Handle special arguments for copying IPs
+    if arguments.local_ip:
+        _, primary = discover_interfaces()
+        print(get_local_ip(primary) if primary else "N/A")
+        return
+    if arguments.external_ip:
+        print(get_external_ip(block=True))
+        return
+
+    # Stay resident and print one JSON line per tick
+    try:
+        stream(arguments.interval, arguments.history)
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Where the modules keep their files, and how they replace them.
+
+CACHE_DIR ($XDG_CACHE_HOME/waybar) holds what survives a reboot: the IP
+lookup, forecasts and album art. RUNTIME_DIR ($XDG_RUNTIME_DIR, else /tmp)
+holds what should not: stats, the sys-mon history, the album-art link and the
+waybar-py sockets. CONFIG_DIR is $XDG_CONFIG_HOME/waybar.
+
+Files are never written in place, since another process (or another thread of
+waybar-py) may be reading them: atomic_write() and atomic_symlink() build the
+new file under a name unique to the writing thread and rename it over the old.
+
+    paths.py   prints the directories in effect
+"""
+import os
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "waybar")
+CONFIG_DIR = os.path.join(os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config"), "waybar")
+RUNTIME_DIR = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+
+def temp_name(path):
+    import threading
+    # Threads of one process (all of waybar-py) write too, so the pid alone is not unique
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+def atomic_write(path, data):
+    """Replace path with data (str or bytes) in one rename."""
+    tmp = temp_name(path)
+    try:
+        with open(tmp, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+def atomic_symlink(target, link):
+    """Point link at target in one rename."""
+    tmp = temp_name(link)
+    os.symlink(target, tmp)
+    try:
+        os.replace(tmp, link)
+    except:
+        os.unlink(tmp)
+        raise
+
+if __name__ == "__main__":
+    for name in ("CACHE_DIR", "CONFIG_DIR", "RUNTIME_DIR"):
+        print(f"{name}: {globals()[name]}")
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Cold-start profiling for the waybar modules (their --profile-startup flag).
+
+Runs a module under `python -X importtime`, waits for its first JSON line
+and reports the time to get there plus the most expensive imports. The exit
+status is 1 when the module is over its documented budget, so the check can
+be scripted.
+"""
+import subprocess
+import sys
+import time
+
+def parse_importtime(stderr, nested=False):
+    """[(module, cumulative ms)] for top-level imports (every import with nested=True)
+    from -X importtime output."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented below their parent
+        if name.startswith("  ") and not nested:
+            continue
+        imports.append((name.strip(), int(cumulative) / 1000))
+    return imports
+
+def run(script, args):
+    """(first stdout line, ms to get it, -X importtime output) of one cold start."""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-X", "importtime", script, *args],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    first_line = proc.stdout.readline()
+    first_json_ms = (time.perf_counter() - start) * 1000
+    # Streaming modules never exit on their own
+    proc.kill()
+    _, stderr = proc.communicate()
+    return first_line, first_json_ms, stderr
+
+def profile(script, args, budget_ms, top=8):
+    first_line, first_json_ms, stderr = run(script, args)
+    imports = parse_importtime(stderr)
+    print(f"{script}")
+    print(f"  time to first JSON: {first_json_ms:.1f} ms (budget {budget_ms} ms)")
+    print(f"  imports: {sum(ms for _, ms in imports):.1f} ms")
+    for name, ms in sorted(imports, key=lambda i: i[1], reverse=True)[:top]:
+        print(f"    {ms:7.1f} ms  {name}")
+
+    if not first_line.strip():
+        print("  no JSON line was written")
+        return 1
+    if first_json_ms > budget_ms:
+        print("  over budget")
+        return 1
+    return 0
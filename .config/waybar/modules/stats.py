@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Timing and error counters for the collectors and fetches (--stats).
+
+Off unless a module is started with --stats or WAYBAR_STATS=1 is set (child
+processes inherit it). While off, timed() hands back the function itself and
+failed() returns at once, so the modules pay nothing. While on, every timed
+call is measured with perf_counter, and failures are counted with their last
+message: exceptions that escape, and ones the modules swallow where they call
+failed() from the except clause.
+
+The last SAMPLES durations per name are kept in
+$XDG_RUNTIME_DIR/waybar-stats-<script>.json, merged under flock on exit (and
+every SAVE_INTERVAL while resident), so one-shot runs and background refresh
+processes add up.
+
+    stats.py [SCRIPT...]   prints p50/p99, calls, errors and the last error
+"""
+import json
+import os
+import sys
+import time
+
+from paths import RUNTIME_DIR, atomic_write
+
+SCRIPT = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+SAMPLES = 200  # Durations kept per name
+SAVE_INTERVAL = 30  # Seconds between saves of a resident process
+
+ENABLED = False
+_loaded = {}  # name -> counters as last saved by any process
+_pending = {}  # name -> counters gathered by this process since its last save
+_saved = 0.0
+_lock = None
+
+def stats_file(script=SCRIPT):
+    return os.path.join(RUNTIME_DIR, f"waybar-stats-{script}.json")
+
+def enable():
+    global ENABLED, _lock, _saved
+    if ENABLED:
+        return
+    import atexit
+    import threading
+    ENABLED = True
+    os.environ["WAYBAR_STATS"] = "1"  # Background refreshes count too
+    _lock = threading.Lock()
+    _loaded.update(read_file(stats_file()))
+    _saved = time.monotonic()
+    atexit.register(save)
+    # waybar stops resident modules with SIGTERM, which would skip atexit
+    import signal
+    if threading.current_thread() is threading.main_thread() and signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+def empty():
+    return {"samples": [], "calls": 0, "errors": 0, "last_error": None}
+
+def combine(old, new):
+    return {"samples": (old["samples"] + new["samples"])[-SAMPLES:],
+            "calls": old["calls"] + new["calls"],
+            "errors": old["errors"] + new["errors"],
+            "last_error": new["last_error"] or old["last_error"]}
+
+def pending(name):
+    counters = _pending.get(name)
+    if counters is None:
+        counters = _pending[name] = empty()
+    return counters
+
+def record(name, seconds):
+    with _lock:
+        counters = pending(name)
+        counters["calls"] += 1
+        counters["samples"].append(seconds * 1000)
+        if len(counters["samples"]) > SAMPLES:
+            del counters["samples"][0]
+
+def failed(name):
+    """Count the exception being handled against name. Call from an except clause."""
+    if not ENABLED:
+        return
+    error = sys.exc_info()[1]
+    message = f"{type(error).__name__}: {error}" if error is not None else "failed"
+    with _lock:
+        counters = pending(name)
+        counters["errors"] += 1
+        counters["last_error"] = [time.time(), message[:200]]
+
+def timed(name, fn):
+    """fn, timed and with its exceptions counted under name when stats are on."""
+    if not ENABLED:
+        return fn
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except:
+            failed(name)
+            raise
+        finally:
+            record(name, time.perf_counter() - start)
+    return wrapper
+
+def read_file(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except:
+        return {}
+
+def save():
+    """Merge this process's counters into the stats file."""
+    global _loaded, _pending, _saved
+    import fcntl
+    with _lock:
+        fresh, _pending = _pending, {}
+    _saved = time.monotonic()
+    path = stats_file()
+    try:
+        with open(path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            merged = read_file(path)
+            for name, counters in fresh.items():
+                merged[name] = combine(merged.get(name, empty()), counters)
+            atomic_write(path, json.dumps(merged))
+        _loaded = merged
+    except OSError:
+        pass
+
+def current(name):
+    counters = _loaded.get(name, empty())
+    if name in _pending:
+        counters = combine(counters, _pending[name])
+    return counters
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def summary(name, counters):
+    samples = counters["samples"]
+    line = f"{name}: "
+    line += f"{percentile(samples, 50):.1f}/{percentile(samples, 99):.1f} ms" if samples else "-"
+    line += f", {counters['calls']} calls, {counters['errors']} errors"
+    if counters["last_error"]:
+        at, message = counters["last_error"]
+        line += f" (last {time.strftime('%H:%M:%S', time.localtime(at))}: {message})"
+    return line
+
+def tooltip_lines(names):
+    """Pango lines for the tooltip, or [] while stats are off."""
+    if not ENABLED:
+        return []
+    import html
+    if time.monotonic() - _saved >= SAVE_INTERVAL:
+        save()
+    with _lock:
+        lines = [html.escape(summary(name, current(name))) for name in names]
+    return ["<span foreground='#6acda2'>Stats (p50/p99):</span>"] + lines
+
+if os.environ.get("WAYBAR_STATS") and __name__ != "__main__":
+    enable()
+
+if __name__ == "__main__":
+    import glob
+    scripts = sys.argv[1:] or sorted(os.path.basename(p)[len("waybar-stats-"):-len(".json")]
+                                     for p in glob.glob(stats_file("*")))
+    for script in scripts:
+        print(f"{script}:")
+        for name, counters in sorted(read_file(stats_file(script)).items()):
+            print("  " + summary(name, counters))
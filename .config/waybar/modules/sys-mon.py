@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
+# Cold-start budget: 150 ms to the first JSON line (check with --profile-startup).
+# Modules only needed by optional paths (GPU tools, clicks) are imported where used.
+import errno
 import json
 import psutil
-import subprocess
 import os
 import re
+import sys
 import time
-import shutil
-import glob
+import argparse
+import mmap
+import struct
+
+import colors
+import stats
+from paths import RUNTIME_DIR, atomic_write
 
 # ---------------------------
 # CONFIG / ICONS
@@ -18,390 +26,1222 @@ SSD_ICON = "󰋊"  # nf-md-harddisk
 HDD_ICON = "󰋊"  # nf-md-harddisk
 PINK = "#6acda2"
 
-COLOR_TABLE = [
-    {"color": "#8caaee", "cpu_gpu_temp": (0, 25),  "cpu_power": (0.0, 20),   "gpu_power": (0.0, 50),   "mem_storage": (0.0, 10)},
-    {"color": "#99d1db", "cpu_gpu_temp": (26, 30), "cpu_power": (21.0, 40),  "gpu_power": (51.0, 100), "mem_storage": (10.0, 20)},
-    {"color": "#81c8be", "cpu_gpu_temp": (31, 45), "cpu_power": (41.0, 60),  "gpu_power": (101.0,200), "mem_storage": (20.0, 40)},
-    {"color": "#e5c890", "cpu_gpu_temp": (46, 60), "cpu_power": (61.0, 80),  "gpu_power": (201.0,300), "mem_storage": (40.0, 60)},
-    {"color": "#ef9f76", "cpu_gpu_temp": (61, 75), "cpu_power": (81.0, 100), "gpu_power": (301.0,400), "mem_storage": (60.0, 80)},
-    {"color": "#ea999c", "cpu_gpu_temp": (76, 85), "cpu_power": (101.0,120), "gpu_power": (401.0,450), "mem_storage": (80.0, 90)},
-    {"color": "#e78284", "cpu_gpu_temp": (86,999), "cpu_power": (121.0,999), "gpu_power": (451.0,999), "mem_storage": (90.0,100)}
-]
-
-def get_color(value, metric_type):
-    try:
-        value = float(value)
-    except:
-        return "#ffffff"
-    for entry in COLOR_TABLE:
-        low, high = entry.get(metric_type, (0, 0))
-        if low <= value <= high:
-            return entry["color"]
-    return COLOR_TABLE[-1]["color"]
+STREAM_INTERVAL = 5  # Seconds between lines in --stream mode
+STARTUP_BUDGET_MS = 150
+STATE_FILE = os.path.join(RUNTIME_DIR, "waybar-sys-mon.json")  # Counters and slow values carried between one-shot runs
+SENSOR_CACHE = os.path.join(RUNTIME_DIR, "waybar-sys-mon-sensors.json")  # Sensor paths, valid for one boot
+HISTORY_FILE = os.path.join(RUNTIME_DIR, "waybar-sys-mon-history.bin")  # Memory-mapped metric rings
 
-def color_text(value, metric_type):
-    return f"<span foreground='{get_color(value, metric_type)}'>{value}</span>"
+# Prefix for every /sys and /proc path, so the module can run against a fixture tree
+FS_ROOT = os.environ.get("WAYBAR_FS_ROOT", "")
+HWMON_DIR = FS_ROOT + "/sys/class/hwmon"
+DRM_DIR = FS_ROOT + "/sys/class/drm"
+RAPL_DIR = FS_ROOT + "/sys/class/powercap/intel-rapl:0"
+if FS_ROOT:
+    psutil.PROCFS_PATH = FS_ROOT + "/proc"
+
+def color_text(value, metric_type, fmt=""):
+    return f"<span foreground='{colors.color(value, metric_type)}'>{format(value, fmt)}</span>"
 
 # ---------------------------
-# CPU STATS
+# DELTA SAMPLER
 # ---------------------------
-cpu_percent = psutil.cpu_percent(interval=0.5)
-cpu_freq = psutil.cpu_freq()
-cpu_current = cpu_freq.current if cpu_freq else 0
-cpu_max = cpu_freq.max if cpu_freq else 0
-
-max_cpu_temp = 0
-try:
-    temps = psutil.sensors_temperatures()
-    k10 = temps.get("k10temp", []) or []
-    
-    # Collect all available temperature readings
-    temp_readings = []
-    for t in k10:
-        if t.current and t.current > 0:
-            temp_readings.append(t.current)
-    
-    # Use average of all sensors (like btop does)
-    if temp_readings:
-        max_cpu_temp = sum(temp_readings) / len(temp_readings)
-except:
-    max_cpu_temp = 0
-
-# CPU Power - AMD Ryzen power monitoring
-cpu_power = 0.0
-
-# Method 1: Try nct6687 Super I/O chip (common on AMD motherboards)
-try:
-    for hwmon in os.listdir("/sys/class/hwmon"):
-        hwmon_dir = os.path.join("/sys/class/hwmon", hwmon)
-        name_file = os.path.join(hwmon_dir, "name")
-        if os.path.exists(name_file):
-            with open(name_file) as f:
-                name = f.read().strip()
-            if "nct66" in name.lower():  # nct6687, nct6683, etc.
-                # Look for CPU power in voltage/current readings
-                power_files = glob.glob(os.path.join(hwmon_dir, "power*_input"))
-                if power_files:
-                    for pf in power_files:
-                        try:
-                            with open(pf) as f:
-                                power_val = float(f.read().strip()) / 1000000  # microwatts to watts
-                                # CPU power is usually 50-150W, filter out unrealistic values
-                                if 10 < power_val < 300:
-                                    cpu_power = power_val
-                                    break
-                        except:
-                            pass
-                if cpu_power > 0:
-                    break
-except:
-    pass
+class Sampler:
+    """Turns monotonically increasing counters into rates.
+
+    Each call compares a counter with the reading from the previous tick, so
+    nothing has to sleep between two reads. In --stream mode the readings live
+    in memory; one-shot runs carry them over through STATE_FILE.
+    """
+
+    def __init__(self, prev=None):
+        self.prev = prev or {}
+
+    def rate(self, key, value, wrap=None):
+        """Per-second rate of `value` since the last call, or None on the first one."""
+        now = time.monotonic()
+        prev = self.prev.get(key)
+        self.prev[key] = (value, now)
+        if prev is None:
+            return None
+        delta = value - prev[0]
+        elapsed = now - prev[1]
+        if delta < 0:
+            # Counter wrapped around (or was reset); only trust it with a known range
+            if not wrap:
+                return None
+            delta += wrap
+        if elapsed <= 0:
+            return None
+        return delta / elapsed
+
+    def cpu_percent(self):
+        t = psutil.cpu_times()
+        # Same accounting as psutil.cpu_percent(): guest time is already in user
+        total = sum(t) - getattr(t, "guest", 0) - getattr(t, "guest_nice", 0)
+        busy = total - t.idle - getattr(t, "iowait", 0)
+        prev = self.prev.get("cpu")
+        self.prev["cpu"] = (busy, total)
+        if prev is not None and total > prev[1]:
+            busy, total = busy - prev[0], total - prev[1]
+        # Without a previous reading this is the average since boot
+        return max(0.0, min(100.0, busy / total * 100)) if total else 0.0
 
-# Method 2: Try AMD RAPL through sysfs energy counters
-if cpu_power == 0.0:
+def load_state():
     try:
-        # Check for AMD CPU energy counter in hwmon
-        for hwmon in os.listdir("/sys/class/hwmon"):
-            hwmon_dir = os.path.join("/sys/class/hwmon", hwmon)
-            name_file = os.path.join(hwmon_dir, "name")
-            if os.path.exists(name_file):
-                with open(name_file) as f:
-                    name = f.read().strip()
-                if name in ["k10temp", "zenpower"]:
-                    energy_file = os.path.join(hwmon_dir, "energy1_input")
-                    if os.path.exists(energy_file):
-                        with open(energy_file) as f:
-                            e1 = int(f.read().strip())
-                        time.sleep(0.5)
-                        with open(energy_file) as f:
-                            e2 = int(f.read().strip())
-                        cpu_power = ((e2 - e1) / 1000000) / 0.5  # microjoules to watts
-                        break
+        with open(STATE_FILE) as f:
+            return json.load(f)
     except:
-        pass
+        return {}
 
-# Method 3: Try Intel RAPL (your system has it, though it's an AMD CPU)
-if cpu_power == 0.0:
+def save_state(state):
     try:
-        energy_file = "/sys/class/powercap/intel-rapl:0/energy_uj"
-        if os.path.exists(energy_file):
-            with open(energy_file) as f:
-                e1 = int(f.read().strip())
-            time.sleep(0.5)
-            with open(energy_file) as f:
-                e2 = int(f.read().strip())
-            cpu_power = ((e2 - e1) / 1e6) / 0.5
+        atomic_write(STATE_FILE, json.dumps(state))
     except:
         pass
 
 # ---------------------------
-# GPU STATS (AMD)
+# SENSOR DISCOVERY
 # ---------------------------
-gpu_util = 0
-gpu_temp = 0
-gpu_power = 0.0
-gpu_freq = 0
-gpu_max_freq = 0
-gpu_name = "PowerColor RX 6900 XT"
-
-# Try rocm-smi first (most reliable for AMD)
-try:
-    out = subprocess.check_output(
-        ["rocm-smi", "--showuse", "--showpower", "--showtemp", "--showclocks"],
-        stderr=subprocess.DEVNULL,
-        text=True,
-        timeout=2
-    )
-    
-    # Don't parse GPU name from rocm-smi, keep hardcoded name
-    
-    # Parse utilization (GPU use %)
-    match_util = re.search(r'GPU use \(%\)\s*:\s*(\d+)', out)
-    if match_util:
-        gpu_util = int(match_util.group(1))
-    
-    # Parse power (Average Graphics Package Power)
-    match_power = re.search(r'Average Graphics Package Power \(W\)\s*:\s*([\d\.]+)', out)
-    if match_power:
-        gpu_power = float(match_power.group(1))
-    
-    # Parse temperature (Temperature - edge)
-    match_temp = re.search(r'Temperature \(Sensor edge\) \(C\)\s*:\s*([\d\.]+)', out)
-    if match_temp:
-        gpu_temp = int(float(match_temp.group(1)))
-    
-    # Parse current clock - multiple methods to find active clock
-    # Method 1: Look for lines with asterisk (active state marker)
-    for line in out.split('\n'):
-        if '*' in line and 'Mhz' in line.lower():
-            match = re.search(r'(\d+)\s*Mhz', line, re.IGNORECASE)
-            if match:
-                gpu_freq = int(match.group(1))
-                break
-    
-    # Method 2: If still 0, try sclk pattern
-    if gpu_freq == 0:
-        match_clock = re.search(r'sclk.*?(\d+)\s*Mhz', out, re.IGNORECASE | re.DOTALL)
-        if match_clock:
-            gpu_freq = int(match_clock.group(1))
-    
-    # Parse max clock - look for highest clock value
-    all_clocks = re.findall(r'(\d+)\s*Mhz', out, re.IGNORECASE)
-    if all_clocks:
-        gpu_max_freq = max(int(c) for c in all_clocks)
-
-except (FileNotFoundError, subprocess.TimeoutExpired, subprocess.CalledProcessError):
-    # Fallback to sysfs for AMD GPU
+def read_text(path):
+    with open(path) as f:
+        return f.read().strip()
+
+def read_int(path):
+    with open(path) as f:
+        return int(f.read().strip())
+
+def discover_sensors():
+    """Walk hwmon, drm and powercap once and map each sensor role to its files."""
+    sensors = {
+        "cpu_temps": [],        # k10temp temp*_input
+        "cpu_power": [],        # nct66xx power*_input
+        "cpu_energy": None,     # k10temp/zenpower energy1_input
+        "rapl_energy": None,    # intel-rapl:0 energy_uj
+        "rapl_max_range": None, # intel-rapl:0 max_energy_range_uj
+        "dimm_temps": [],       # DIMM/memory temp1_input
+        "gpu_card": None,       # amdgpu device directory
+        "gpu_hwmon": None,      # amdgpu hwmon directory
+    }
+
     try:
-        # Find AMD GPU card
-        drm_base = "/sys/class/drm"
-        card_path = None
-        
-        for card in ["card0", "card1", "card2"]:
-            card_dir = os.path.join(drm_base, card, "device")
-            if os.path.exists(card_dir):
-                vendor_file = os.path.join(card_dir, "vendor")
-                if os.path.exists(vendor_file):
-                    with open(vendor_file) as f:
-                        vendor = f.read().strip()
-                    if vendor == "0x1002":  # AMD vendor ID
-                        card_path = card_dir
-                        break
-        
-        if card_path:
-            # Don't parse GPU name from sysfs, keep hardcoded name
-            
-            # Get hwmon path
-            hwmon_dir = os.path.join(card_path, "hwmon")
-            if os.path.exists(hwmon_dir):
-                hwmons = os.listdir(hwmon_dir)
-                if hwmons:
-                    hwmon_path = os.path.join(hwmon_dir, hwmons[0])
-                    
-                    # Temperature
-                    temp_path = os.path.join(hwmon_path, "temp1_input")
-                    if os.path.exists(temp_path):
-                        with open(temp_path) as f:
-                            gpu_temp = int(f.read().strip()) // 1000
-                    
-                    # Power (in microwatts)
-                    power_path = os.path.join(hwmon_path, "power1_average")
-                    if os.path.exists(power_path):
-                        with open(power_path) as f:
-                            gpu_power = float(f.read().strip()) / 1000000
-            
-            # GPU utilization
-            busy_path = os.path.join(card_path, "gpu_busy_percent")
-            if os.path.exists(busy_path):
-                with open(busy_path) as f:
-                    gpu_util = int(f.read().strip())
-            
-            # GPU clock frequency
-            sclk_path = os.path.join(card_path, "pp_dpm_sclk")
-            if os.path.exists(sclk_path):
-                with open(sclk_path) as f:
-                    lines = f.readlines()
-                    for line in lines:
-                        if '*' in line:  # Current clock marked with *
-                            match = re.search(r'(\d+)Mhz', line)
-                            if match:
-                                gpu_freq = int(match.group(1))
-                        # Get last line for max freq
-                        match = re.search(r'(\d+)Mhz', lines[-1])
-                        if match:
-                            gpu_max_freq = int(match.group(1))
+        hwmons = sorted(os.listdir(HWMON_DIR))
+    except:
+        hwmons = []
+    for hwmon in hwmons:
+        hwmon_dir = os.path.join(HWMON_DIR, hwmon)
+        try:
+            name = read_text(os.path.join(hwmon_dir, "name"))
+            files = sorted(os.listdir(hwmon_dir))
+        except:
+            continue
+        if name == "k10temp":
+            sensors["cpu_temps"] += [os.path.join(hwmon_dir, f) for f in files
+                                     if f.startswith("temp") and f.endswith("_input")]
+        if "nct66" in name.lower():  # nct6687, nct6683, etc.
+            sensors["cpu_power"] += [os.path.join(hwmon_dir, f) for f in files
+                                     if f.startswith("power") and f.endswith("_input")]
+        if name in ["k10temp", "zenpower"] and "energy1_input" in files and not sensors["cpu_energy"]:
+            sensors["cpu_energy"] = os.path.join(hwmon_dir, "energy1_input")
+        # Look for memory thermal sensors
+        if ("dimm" in name.lower() or "mem" in name.lower()) and "temp1_input" in files:
+            sensors["dimm_temps"].append(os.path.join(hwmon_dir, "temp1_input"))
+
+    if os.path.exists(os.path.join(RAPL_DIR, "energy_uj")):
+        sensors["rapl_energy"] = os.path.join(RAPL_DIR, "energy_uj")
+        if os.path.exists(os.path.join(RAPL_DIR, "max_energy_range_uj")):
+            sensors["rapl_max_range"] = os.path.join(RAPL_DIR, "max_energy_range_uj")
+
+    try:
+        cards = sorted(c for c in os.listdir(DRM_DIR) if re.fullmatch(r"card\d+", c))
+    except:
+        cards = []
+    for card in cards:
+        card_dir = os.path.join(DRM_DIR, card, "device")
+        try:
+            if read_text(os.path.join(card_dir, "vendor")) != "0x1002":  # AMD vendor ID
+                continue
+        except:
+            continue
+        sensors["gpu_card"] = card_dir
+        try:
+            hwmons = sorted(os.listdir(os.path.join(card_dir, "hwmon")))
+            if hwmons:
+                sensors["gpu_hwmon"] = os.path.join(card_dir, "hwmon", hwmons[0])
+        except:
+            pass
+        break
+
+    return sensors
+
+def boot_id():
+    try:
+        return read_text(FS_ROOT + "/proc/sys/kernel/random/boot_id")
+    except:
+        return None
+
+def load_sensors():
+    """Sensor index for one-shot runs, cached on disk until the next boot."""
+    current_boot = boot_id()
+    try:
+        with open(SENSOR_CACHE) as f:
+            cached = json.load(f)
+        if current_boot and cached.get("boot_id") == current_boot:
+            return cached["sensors"]
     except:
         pass
 
-# Try NVIDIA as final fallback
-if gpu_temp == 0 and gpu_name == "Unknown GPU":
+    sensors = discover_sensors()
     try:
-        out = subprocess.check_output(
-            ["nvidia-smi", "--query-gpu=name,temperature.gpu,power.draw,utilization.gpu,clocks.gr,clocks.max.gr",
-             "--format=csv,noheader,nounits"],
-            stderr=subprocess.DEVNULL,
-            text=True,
-            timeout=2
-        )
-        parts = out.strip().split(", ")
-        if len(parts) >= 6:
-            gpu_name = parts[0]
-            gpu_temp = int(parts[1])
-            gpu_power = float(parts[2])
-            gpu_util = int(parts[3])
-            gpu_freq = int(parts[4])
-            gpu_max_freq = int(parts[5])
+        atomic_write(SENSOR_CACHE, json.dumps({"boot_id": current_boot, "sensors": sensors}))
     except:
         pass
+    return sensors
 
 # ---------------------------
-# MEMORY STATS
+# CPU STATS
 # ---------------------------
-mem = psutil.virtual_memory()
-mem_used = mem.used / (1024**3)
-mem_total = mem.total / (1024**3)
-mem_percent = mem.percent
-
-ram_temps = []
-hwmon_dir = "/sys/class/hwmon"
-if os.path.exists(hwmon_dir):
-    for hw in os.listdir(hwmon_dir):
-        name_file = os.path.join(hwmon_dir, hw, "name")
-        if os.path.exists(name_file):
+def empty_cpu():
+    return {"percent": 0.0, "current": 0, "max": 0, "temp": 0, "power": 0.0}
+
+def collect_cpu(sampler, sensors):
+    cpu_percent = sampler.cpu_percent()
+    cpu_freq = psutil.cpu_freq()
+    cpu_current = cpu_freq.current if cpu_freq else 0
+    cpu_max = cpu_freq.max if cpu_freq else 0
+
+    # Collect all available k10temp readings
+    temp_readings = []
+    for path in sensors["cpu_temps"]:
+        try:
+            t = read_int(path) / 1000
+            if t > 0:
+                temp_readings.append(t)
+        except:
+            stats.failed("cpu")
+
+    # Use average of all sensors (like btop does)
+    max_cpu_temp = sum(temp_readings) / len(temp_readings) if temp_readings else 0
+
+    # CPU Power - AMD Ryzen power monitoring
+    cpu_power = 0.0
+
+    # Method 1: Try nct6687 Super I/O chip (common on AMD motherboards)
+    for path in sensors["cpu_power"]:
+        try:
+            power_val = read_int(path) / 1000000  # microwatts to watts
+            # CPU power is usually 50-150W, filter out unrealistic values
+            if 10 < power_val < 300:
+                cpu_power = power_val
+                break
+        except:
+            stats.failed("cpu")
+
+    # Method 2: Try AMD RAPL through sysfs energy counters
+    if cpu_power == 0.0 and sensors["cpu_energy"]:
+        try:
+            energy_file = sensors["cpu_energy"]
+            uj_per_sec = sampler.rate(energy_file, read_int(energy_file))
+            cpu_power = (uj_per_sec or 0) / 1000000  # microjoules to watts
+        except:
+            stats.failed("cpu")
+
+    # Method 3: Try Intel RAPL (your system has it, though it's an AMD CPU)
+    if cpu_power == 0.0 and sensors["rapl_energy"]:
+        try:
             try:
-                with open(name_file) as f:
-                    name = f.read().strip()
-                # Look for memory thermal sensors
-                if "dimm" in name.lower() or "mem" in name.lower():
-                    temp_file = os.path.join(hwmon_dir, hw, "temp1_input")
-                    if os.path.exists(temp_file):
-                        with open(temp_file) as f:
-                            t = int(f.read().strip()) / 1000
-                            ram_temps.append(t)
+                wrap = read_int(sensors["rapl_max_range"])
+            except:
+                wrap = None
+            energy_file = sensors["rapl_energy"]
+            uj_per_sec = sampler.rate(energy_file, read_int(energy_file), wrap)
+            cpu_power = (uj_per_sec or 0) / 1e6
+        except:
+            stats.failed("cpu")
+
+    return {
+        "percent": cpu_percent,
+        "current": cpu_current,
+        "max": cpu_max,
+        "temp": max_cpu_temp,
+        "power": cpu_power,
+    }
+
+# ---------------------------
+# GPU STATS (AMD)
+# ---------------------------
+GPU_NAME = "PowerColor RX 6900 XT"  # Don't parse GPU name from the driver, keep hardcoded name
+SCLK_RE = re.compile(r'(\d+)\s*Mhz', re.IGNORECASE)
+
+def empty_gpu():
+    return {"name": GPU_NAME, "util": 0, "temp": 0, "power": 0.0, "freq": 0, "max_freq": 0}
+
+class SysfsFile:
+    """A sysfs attribute that can stay open between ticks.
+
+    With keep_open the descriptor is opened once and every read is a single
+    pread() from offset 0, which makes the kernel regenerate the value.
+    """
+
+    def __init__(self, path, keep_open=False):
+        self.path = path
+        self.keep_open = keep_open
+        self.fd = None
+
+    def read(self):
+        if self.fd is None:
+            fd = os.open(self.path, os.O_RDONLY)
+            if not self.keep_open:
+                try:
+                    return os.read(fd, 4096).decode().strip()
+                finally:
+                    os.close(fd)
+            self.fd = fd
+        return os.pread(self.fd, 4096, 0).decode().strip()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+class AmdgpuBackend:
+    """Reads an amdgpu card straight from sysfs (gpu_busy_percent, pp_dpm_sclk, hwmon)."""
+
+    def __init__(self, sensors, keep_open=False):
+        card, hwmon = sensors["gpu_card"], sensors["gpu_hwmon"]
+        files = {}
+        if card:
+            files["util"] = os.path.join(card, "gpu_busy_percent")
+            files["sclk"] = os.path.join(card, "pp_dpm_sclk")
+        if hwmon:
+            files["temp"] = os.path.join(hwmon, "temp1_input")
+            files["power"] = os.path.join(hwmon, "power1_average")  # microwatts
+        self.files = {k: SysfsFile(path, keep_open) for k, path in files.items()}
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+    def read(self, key):
+        f = self.files.get(key)
+        if f is None:
+            return None
+        try:
+            return f.read()
+        except OSError as e:
+            if e.errno in (errno.ENOENT, errno.EINVAL, errno.EOPNOTSUPP):
+                # Attribute not exposed by this card/driver, stop asking for it
+                del self.files[key]
+            else:
+                # EBUSY/EPERM while the GPU resets or is runtime-suspended: reopen next tick
+                f.close()
+                stats.failed("gpu")
+            return None
+
+    def sample(self):
+        gpu = empty_gpu()
+        try:
+            value = self.read("temp")
+            if value:
+                gpu["temp"] = int(value) // 1000
+            value = self.read("power")
+            if value:
+                gpu["power"] = int(value) / 1000000
+            value = self.read("util")
+            if value:
+                gpu["util"] = int(value)
+
+            # GPU clock frequency, current state is marked with *
+            value = self.read("sclk")
+            if value:
+                lines = value.splitlines()
+                for line in lines:
+                    if '*' in line:
+                        match = SCLK_RE.search(line)
+                        if match:
+                            gpu["freq"] = int(match.group(1))
+                # Last line is the highest DPM state
+                match = SCLK_RE.search(lines[-1])
+                if match:
+                    gpu["max_freq"] = int(match.group(1))
+        except:
+            stats.failed("gpu")
+        return gpu
+
+class RocmSmiBackend:
+    """Forks rocm-smi on every sample; only used when asked for with --gpu rocm-smi."""
+
+    def __init__(self, sensors, keep_open=False):
+        self.fallback = AmdgpuBackend(sensors, keep_open)
+
+    def close(self):
+        self.fallback.close()
+
+    def sample(self):
+        import subprocess
+        try:
+            out = subprocess.check_output(
+                ["rocm-smi", "--showuse", "--showpower", "--showtemp", "--showclocks"],
+                stderr=subprocess.DEVNULL,
+                text=True,
+                timeout=2
+            )
+        except (FileNotFoundError, subprocess.TimeoutExpired, subprocess.CalledProcessError):
+            stats.failed("gpu")
+            return self.fallback.sample()
+
+        gpu = empty_gpu()
+        gpu_util = gpu_temp = gpu_freq = gpu_max_freq = 0
+        gpu_power = 0.0
+
+        # Parse utilization (GPU use %)
+        match_util = re.search(r'GPU use \(%\)\s*:\s*(\d+)', out)
+        if match_util:
+            gpu_util = int(match_util.group(1))
+
+        # Parse power (Average Graphics Package Power)
+        match_power = re.search(r'Average Graphics Package Power \(W\)\s*:\s*([\d\.]+)', out)
+        if match_power:
+            gpu_power = float(match_power.group(1))
+
+        # Parse temperature (Temperature - edge)
+        match_temp = re.search(r'Temperature \(Sensor edge\) \(C\)\s*:\s*([\d\.]+)', out)
+        if match_temp:
+            gpu_temp = int(float(match_temp.group(1)))
+
+        # Parse current clock - multiple methods to find active clock
+        # Method 1: Look for lines with asterisk (active state marker)
+        for line in out.split('\n'):
+            if '*' in line and 'Mhz' in line.lower():
+                match = re.search(r'(\d+)\s*Mhz', line, re.IGNORECASE)
+                if match:
+                    gpu_freq = int(match.group(1))
+                    break
+
+        # Method 2: If still 0, try sclk pattern
+        if gpu_freq == 0:
+            match_clock = re.search(r'sclk.*?(\d+)\s*Mhz', out, re.IGNORECASE | re.DOTALL)
+            if match_clock:
+                gpu_freq = int(match_clock.group(1))
+
+        # Parse max clock - look for highest clock value
+        all_clocks = re.findall(r'(\d+)\s*Mhz', out, re.IGNORECASE)
+        if all_clocks:
+            gpu_max_freq = max(int(c) for c in all_clocks)
+
+        gpu.update(util=gpu_util, temp=gpu_temp, power=gpu_power, freq=gpu_freq, max_freq=gpu_max_freq)
+        return gpu
+
+NVIDIA_FIELDS = "name,temperature.gpu,power.draw,utilization.gpu,clocks.gr,clocks.max.gr"
+
+def parse_nvidia_csv(line):
+    """One `nvidia-smi --format=csv,noheader,nounits` row of NVIDIA_FIELDS, or None.
+
+    nvidia-smi does not quote the name, so a name with a comma spans several
+    fields; the five numbers are always the last ones.
+    """
+    import csv
+    parts = [p.strip() for p in next(csv.reader([line.strip()], skipinitialspace=True), [])]
+    if len(parts) < 6:
+        return None
+
+    def number(value, kind):
+        # Unsupported fields come back as "[N/A]" or "[Not Supported]"
+        if value.startswith("["):
+            return kind(0)
+        return kind(float(value))
+
+    try:
+        temp, power, util, freq, max_freq = parts[-5:]
+        gpu = empty_gpu()
+        gpu.update(name=", ".join(parts[:-5]) or NVIDIA_NAME,
+                   temp=number(temp, int),
+                   power=number(power, float),
+                   util=number(util, int),
+                   freq=number(freq, int),
+                   max_freq=number(max_freq, int))
+    except ValueError:
+        return None  # Truncated or garbled row
+    return gpu
+
+NVIDIA_NAME = "NVIDIA GPU"  # Until nvidia-smi has answered; GPU_NAME is the AMD card
+NVIDIA_FIRST_ROW = 0.8  # Seconds to wait for a new --loop-ms child, within the gpu deadline
+
+class NvidiaBackend:
+    """Keeps one query session open: NVML when pynvml is installed, else a
+    single `nvidia-smi --loop-ms` child whose CSV rows are read as they arrive."""
+
+    def __init__(self, sensors, keep_open=False, interval=STREAM_INTERVAL):
+        import threading
+        self.keep_open = keep_open
+        self.loop_ms = max(100, int(interval * 1000))
+        self.latest = None
+        self.first_row = threading.Event()
+        self.proc = None
+        self.nvml = None
+        try:
+            import pynvml
+            pynvml.nvmlInit()
+            self.nvml = pynvml
+            self.handle = pynvml.nvmlDeviceGetHandleByIndex(0)
+        except Exception:
+            self.nvml = None
+
+    def sample_nvml(self):
+        nvml, h = self.nvml, self.handle
+        gpu = empty_gpu()
+        name = nvml.nvmlDeviceGetName(h)
+        gpu.update(name=name.decode() if isinstance(name, bytes) else name,
+                   temp=nvml.nvmlDeviceGetTemperature(h, nvml.NVML_TEMPERATURE_GPU),
+                   power=nvml.nvmlDeviceGetPowerUsage(h) / 1000,  # milliwatts to watts
+                   util=nvml.nvmlDeviceGetUtilizationRates(h).gpu,
+                   freq=nvml.nvmlDeviceGetClockInfo(h, nvml.NVML_CLOCK_GRAPHICS),
+                   max_freq=nvml.nvmlDeviceGetMaxClockInfo(h, nvml.NVML_CLOCK_GRAPHICS))
+        return gpu
+
+    def command(self, loop=False):
+        cmd = ["nvidia-smi", "-i", "0", f"--query-gpu={NVIDIA_FIELDS}", "--format=csv,noheader,nounits"]
+        if loop:
+            cmd.append(f"--loop-ms={self.loop_ms}")
+        return cmd
+
+    def start_loop(self):
+        import subprocess
+        import threading
+        self.proc = subprocess.Popen(self.command(loop=True), stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        threading.Thread(target=self.read_loop, args=(self.proc,), daemon=True).start()
+
+    def close(self):
+        if self.proc is not None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=1)
+            except:
+                self.proc.kill()
+            self.proc = None
+        if self.nvml is not None:
+            try:
+                self.nvml.nvmlShutdown()
             except:
                 pass
+            self.nvml = None
+
+    def read_loop(self, proc):
+        for line in proc.stdout:
+            gpu = parse_nvidia_csv(line)
+            if gpu is not None:
+                self.latest = gpu
+                self.first_row.set()
+
+    def sample(self):
+        try:
+            if self.nvml is not None:
+                return self.sample_nvml()
+            if not self.keep_open:
+                import subprocess
+                out = subprocess.check_output(self.command(), stderr=subprocess.DEVNULL,
+                                              text=True, timeout=2)
+                return parse_nvidia_csv(out.strip()) or self.placeholder()
+            # Restart the streaming child if it never started or has exited
+            if self.proc is None or self.proc.poll() is not None:
+                self.start_loop()
+                # Otherwise the first line would show zeros until the next tick
+                self.first_row.wait(NVIDIA_FIRST_ROW)
+        except:
+            stats.failed("gpu")
+        return self.latest or self.placeholder()
+
+    def placeholder(self):
+        gpu = empty_gpu()
+        gpu["name"] = NVIDIA_NAME
+        return gpu
+
+GPU_BACKENDS = {
+    "amdgpu": AmdgpuBackend,
+    "rocm-smi": RocmSmiBackend,
+    "nvidia": NvidiaBackend,
+}
+
+def make_gpu_backend(name, sensors, keep_open=False, interval=STREAM_INTERVAL):
+    if name == "auto":
+        import shutil
+        # Prefer the AMD card found during discovery, then an NVIDIA driver
+        if sensors["gpu_card"] or not shutil.which("nvidia-smi"):
+            name = "amdgpu"
+        else:
+            name = "nvidia"
+    if name == "nvidia":
+        return NvidiaBackend(sensors, keep_open, interval)
+    return GPU_BACKENDS[name](sensors, keep_open)
+
+def collect_gpu(backend):
+    return backend.sample()
+
+# ---------------------------
+# MEMORY STATS
+# ---------------------------
+def empty_memory():
+    return {"used": 0.0, "total": 0.0, "percent": 0.0}
+
+def collect_memory():
+    mem = psutil.virtual_memory()
+    return {
+        "used": mem.used / (1024**3),
+        "total": mem.total / (1024**3),
+        "percent": mem.percent,
+    }
+
+def collect_dimm_temps(sensors):
+    ram_temps = []
+    for path in sensors["dimm_temps"]:
+        try:
+            ram_temps.append(read_int(path) / 1000)
+        except:
+            stats.failed("dimm_temps")
+    return ram_temps
 
 # ---------------------------
 # STORAGE STATS
 # ---------------------------
 EXCLUDE = {"pkg", "log", "boot"}
-partitions = [p for p in psutil.disk_partitions(all=False)
-              if 'rw' in p.opts and p.fstype and os.path.basename(p.mountpoint) not in EXCLUDE]
+# Name shown per filesystem, by UUID or filesystem label. Anything not listed
+# shows its label, else its mount point, e.g.
+#   {"Omarchy": "Omarchy Linux", "a3f9e8d7-c6b5-4a39-8271-605f4e3d2c1b": "Linux Games"}
+DISK_NAMES = {}
+MOUNTINFO = FS_ROOT + "/proc/self/mountinfo"
+DISK_DIR = FS_ROOT + "/dev/disk"
+SECTOR_SIZE = 512  # /proc/diskstats counts 512-byte sectors whatever the device uses
+
+class MountWatch:
+    """Tells whether anything was mounted or unmounted since the last call.
+
+    The kernel flags an open /proc/self/mountinfo with POLLPRI|POLLERR on
+    every change to the mount table, so a resident monitor only rebuilds the
+    mount list when that happens instead of on a timer.
+    """
 
-# Map drives by size to custom names (avoid duplicates)
-storage_entries = []
-seen_labels = set()
+    def __init__(self, path=MOUNTINFO):
+        import select
+        self.file = open(path)
+        self.poll = select.poll()
+        self.poll.register(self.file, select.POLLPRI | select.POLLERR)
 
-for p in partitions:
+    def changed(self):
+        return bool(self.poll.poll(0))
+
+    def close(self):
+        self.file.close()
+
+def watch_mounts():
+    """Triggers for Monitor: the mount list follows mountinfo, where it can be watched."""
     try:
-        usage_info = psutil.disk_usage(p.mountpoint)
-        usage = usage_info.percent
-        total_gb = usage_info.total / (1024**3)
-        
-        # Identify drives by size
-        if 1800 < total_gb < 2200:  # 2TB drive
-            label = "Omarchy Linux"
-            icon = SSD_ICON
-        elif 900 < total_gb < 1200:  # 1TB drive
-            label = "Linux Games"
-            icon = SSD_ICON
-        else:
-            label = os.path.basename(p.mountpoint) or "Unknown"
-            icon = HDD_ICON
-        
-        # Skip if we've already added this label
-        if label not in seen_labels:
-            storage_entries.append((icon, label, usage))
-            seen_labels.add(label)
+        return {"mounts": MountWatch()}
     except:
-        pass
+        return {}
+
+def unescape(field, pattern=re.compile(r"\\(?:([0-7]{3})|x([0-9a-fA-F]{2}))")):
+    # mountinfo escapes octal (\040), udev's /dev/disk links hex (\x20)
+    return pattern.sub(lambda m: chr(int(m.group(1), 8) if m.group(1) else int(m.group(2), 16)), field)
+
+def physical_filesystems():
+    """Filesystem types backed by a block device (not "nodev" in /proc/filesystems)."""
+    try:
+        with open(FS_ROOT + "/proc/filesystems") as f:
+            return {line.split()[-1] for line in f if line.strip() and not line.startswith("nodev")}
+    except:
+        return set()
+
+def disk_labels():
+    """Kernel device name -> (UUID, filesystem label) from the /dev/disk/by-* links."""
+    labels = {}
+    for i, kind in enumerate(("by-uuid", "by-label")):
+        directory = os.path.join(DISK_DIR, kind)
+        try:
+            entries = os.listdir(directory)
+        except:
+            continue
+        for entry in entries:
+            try:
+                device = os.path.basename(os.readlink(os.path.join(directory, entry)))
+            except OSError:
+                continue
+            ids = labels.setdefault(device, [None, None])
+            ids[i] = unescape(entry)
+    return labels
+
+def rotational(device):
+    """True for a spinning disk; a partition answers for the disk it is on."""
+    path = os.path.realpath(f"{FS_ROOT}/sys/class/block/{device}")
+    if os.path.exists(os.path.join(path, "partition")):
+        path = os.path.dirname(path)
+    try:
+        return read_text(os.path.join(path, "queue", "rotational")) == "1"
+    except:
+        return False
+
+def collect_mounts():
+    """Read-write mounts of block device filesystems, one per device, from mountinfo."""
+    physical = physical_filesystems()
+    labels = disk_labels()
+    mounts = []
+    seen = set()
+    with open(MOUNTINFO) as f:
+        for line in f:
+            # id parent major:minor root mountpoint options [optional...] - fstype source super-options
+            fields = line.split()
+            try:
+                separator = fields.index("-", 6)
+                mountpoint, options = unescape(fields[4]), fields[5].split(",")
+                fstype, source = fields[separator + 1], fields[separator + 2]
+            except (ValueError, IndexError):
+                continue
+            if "rw" not in options or fstype not in physical or os.path.basename(mountpoint) in EXCLUDE:
+                continue
+            # /dev/mapper/* and /dev/disk/* names resolve to the kernel's name (dm-0, sda2)
+            device = os.path.basename(os.path.realpath(FS_ROOT + unescape(source)))
+            if device in seen:
+                continue  # Btrfs subvolumes and bind mounts of a filesystem already listed
+            seen.add(device)
+            uuid, label = labels.get(device, (None, None))
+            mounts.append({
+                "mountpoint": mountpoint,
+                "device": device,
+                "name": DISK_NAMES.get(uuid) or DISK_NAMES.get(label) or label
+                        or os.path.basename(mountpoint) or "Unknown",
+                "icon": HDD_ICON if rotational(device) else SSD_ICON,
+            })
+    return mounts
+
+def collect_disk_usage(mounts):
+    """Percent used per mount point, as df counts it (root-reserved blocks left out)."""
+    usage = {}
+    for mount in mounts:
+        try:
+            st = os.statvfs(mount["mountpoint"])
+            used = (st.f_blocks - st.f_bfree) * st.f_frsize
+            available = st.f_bavail * st.f_frsize
+            usage[mount["mountpoint"]] = used / (used + available) * 100 if used + available else 0.0
+        except:
+            stats.failed("disk_usage")
+    return usage
+
+def collect_disk_io(sampler, mounts):
+    """(read, written) bytes per second per mounted device, from /proc/diskstats deltas."""
+    devices = {mount["device"] for mount in mounts}
+    rates = {}
+    with open(FS_ROOT + "/proc/diskstats") as f:
+        for line in f:
+            # major minor name reads merged sectors-read ms writes merged sectors-written ...
+            fields = line.split()
+            if len(fields) < 10 or fields[2] not in devices:
+                continue
+            name = fields[2]
+            rates[name] = (sampler.rate(f"disk:{name}:read", int(fields[5]) * SECTOR_SIZE),
+                           sampler.rate(f"disk:{name}:write", int(fields[9]) * SECTOR_SIZE))
+    return rates
+
+def format_rate(bytes_per_sec):
+    if bytes_per_sec < 1024:
+        text = f"{bytes_per_sec:.0f} B/s"
+    elif bytes_per_sec < 1024**2:
+        text = f"{bytes_per_sec / 1024:.0f} KB/s"
+    else:
+        text = f"{bytes_per_sec / 1024**2:.1f} MB/s"
+    return f"<span foreground='{colors.color(bytes_per_sec, 'disk_io')}'>{text}</span>"
 
 # ---------------------------
-# TOP BAR TEXT (CPU temp, GPU temp, RAM usage only)
+# HISTORY
 # ---------------------------
-top_text = (
-    f"{CPU_ICON} {color_text(f'{max_cpu_temp:.0f}' if max_cpu_temp else '0','cpu_gpu_temp')}°C  "
-    f"{GPU_ICON} {color_text(f'{gpu_temp}','cpu_gpu_temp')}°C  "
-    f"{MEM_ICON} {color_text(f'{mem_percent:.0f}','mem_storage')}%"
-)
+HISTORY_SLOTS = 64      # Samples kept per metric
+HISTORY_WINDOW = 180    # Seconds shown in the tooltip
+SPARK_WIDTH = 30
+SPARKS = "▁▂▃▄▅▆▇█"
+# name: (label, unit)
+HISTORY_METRICS = {
+    "cpu_percent": ("CPU", "%"),
+    "cpu_power": ("CPU", "W"),
+    "cpu_temp": ("CPU", "°C"),
+    "gpu_util": ("GPU", "%"),
+    "gpu_temp": ("GPU", "°C"),
+    "mem_percent": ("RAM", "%"),
+}
+
+class History:
+    """A fixed ring of float32 samples per metric, memory-mapped from HISTORY_FILE.
+
+    Layout: header, one float64 timestamp per slot, then each metric's slots
+    back to back. Recording writes one slot per metric and the header, and the
+    file lives in XDG_RUNTIME_DIR so history survives restarts but not reboots.
+    """
+    HEADER = struct.Struct("<4sIIII")  # magic, slots, metrics, head, count
+    MAGIC = b"WBH1"
+    OFFSET = 32
+
+    def __init__(self, path=HISTORY_FILE, slots=HISTORY_SLOTS, metrics=tuple(HISTORY_METRICS)):
+        self.slots = slots
+        self.metrics = list(metrics)
+        size = self.OFFSET + slots * 8 + len(self.metrics) * slots * 4
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            self.map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        magic, file_slots, file_metrics, self.head, self.count = self.HEADER.unpack_from(self.map)
+        if (magic, file_slots, file_metrics) != (self.MAGIC, slots, len(self.metrics)):
+            self.head = self.count = 0
+            self.HEADER.pack_into(self.map, 0, self.MAGIC, slots, len(self.metrics), 0, 0)
+        self.view = memoryview(self.map)
+        self.times = self.view[self.OFFSET:self.OFFSET + slots * 8].cast("d")
+        self.values = self.view[self.OFFSET + slots * 8:].cast("f")
+
+    def close(self):
+        # The map cannot close while views into it are alive
+        self.times.release()
+        self.values.release()
+        self.view.release()
+        self.map.close()
+
+    def record(self, now, sample):
+        head = self.head
+        self.times[head] = now
+        for i, name in enumerate(self.metrics):
+            self.values[i * self.slots + head] = float(sample.get(name) or 0)
+        self.head = (head + 1) % self.slots
+        self.count = min(self.count + 1, self.slots)
+        self.HEADER.pack_into(self.map, 0, self.MAGIC, self.slots, len(self.metrics), self.head, self.count)
+
+    def ordered(self, ring):
+        """Oldest-first copy of the valid part of a ring."""
+        if self.count < self.slots:
+            return ring[:self.head].tolist()
+        return ring[self.head:].tolist() + ring[:self.head].tolist()
+
+    def window(self, seconds, now):
+        """{metric: samples} recorded during the last `seconds`, oldest first."""
+        import bisect
+        times = self.ordered(self.times)
+        start = bisect.bisect_left(times, now - seconds)
+        return {name: self.ordered(self.values[i * self.slots:(i + 1) * self.slots])[start:]
+                for i, name in enumerate(self.metrics)}
+
+def open_history():
+    try:
+        return History()
+    except (OSError, ValueError):
+        return None
+
+def sparkline(values, low, high, width=SPARK_WIDTH):
+    if len(values) > width:
+        # Keep the peak of each bucket so short spikes stay visible
+        step = len(values) / width
+        values = [max(values[int(i * step):int((i + 1) * step)] or values[-1:]) for i in range(width)]
+    scale = (len(SPARKS) - 1) / (high - low) if high > low else 0
+    return "".join(SPARKS[int((v - low) * scale)] for v in values)
+
+def history_lines(history, now):
+    lines = []
+    for name, values in history.window(HISTORY_WINDOW, now).items():
+        if not values:
+            continue
+        # min/max/sum each run in C over the copied ring
+        low, high, avg = min(values), max(values), sum(values) / len(values)
+        label, unit = HISTORY_METRICS[name]
+        lines.append(f"{label} {unit:<2} {sparkline(values, low, high)} {low:.0f}/{avg:.0f}/{high:.0f}")
+    return lines
 
 # ---------------------------
-# TOOLTIP
+# RENDER
 # ---------------------------
-tooltip_lines = []
-
-# CPU
-tooltip_lines.append(f"<span foreground='{PINK}'>{CPU_ICON} CPU:</span>")
-tooltip_lines.append(f"Type: AMD Ryzen 7 5800X3D")
-tooltip_lines.append(f"Freq: {color_text(f'{cpu_current:.0f}','cpu_power')} / {cpu_max:.0f} MHz")
-tooltip_lines.append(f"Temp: {color_text(f'{max_cpu_temp:.1f}' if max_cpu_temp else '0','cpu_gpu_temp')}°C")
-tooltip_lines.append(f"Power: {color_text(f'{cpu_power:.1f}','cpu_power')} W")
-tooltip_lines.append(f"Util: {color_text(f'{cpu_percent:.0f}','cpu_power')}%")
-tooltip_lines.append("─"*30)
-
-# GPU
-tooltip_lines.append(f"<span foreground='{PINK}'>{GPU_ICON} GPU:</span>")
-tooltip_lines.append(f"Type: {gpu_name}")
-tooltip_lines.append(f"Freq: {color_text(f'{gpu_freq}','gpu_power')} / {gpu_max_freq} MHz")
-tooltip_lines.append(f"Temp: {color_text(f'{gpu_temp}','cpu_gpu_temp')}°C")
-tooltip_lines.append(f"Power: {color_text(f'{gpu_power:.1f}','gpu_power')} W")
-tooltip_lines.append(f"Util: {color_text(f'{gpu_util}','gpu_power')}%")
-tooltip_lines.append("─"*30)
-
-# RAM
-tooltip_lines.append(f"<span foreground='{PINK}'>{MEM_ICON} RAM:</span>")
-tooltip_lines.append(f"Usage: {mem_used:.1f}/{mem_total:.1f} GB ({color_text(f'{mem_percent:.0f}','mem_storage')}%)")
-if ram_temps:
-    for i, t in enumerate(ram_temps[:4]):  # Limit to 4 slots
-        tooltip_lines.append(f"Slot {i+1}: Temp {color_text(f'{t:.0f}','cpu_gpu_temp')}°C")
-tooltip_lines.append("─"*30)
-
-# Storage
-tooltip_lines.append(f"<span foreground='{PINK}'>{SSD_ICON} Storage:</span>")
-for icon, name, usage in storage_entries:
-    if usage is not None:
-        tooltip_lines.append(f"{icon} {name}: {color_text(f'{usage:.0f}','mem_storage')}%")
-tooltip_lines.append("─"*30)
-
-# Click hints
-tooltip_lines.append("🖱️ LMB: Btop | 🖱️ RMB: CoolerControl")
+def stale_marker(stale, section):
+    if section not in stale:
+        return ""
+    age = stale[section]
+    note = f"stale {age:.0f}s" if age is not None else "no data"
+    return f" <span foreground='{colors.HEAT[-1]}'>({note})</span>"
+
+def render(cpu, gpu, mem, dimm_temps, storage_entries, stale=None, history=None, debug=None):
+    stale = stale or {}
+    max_cpu_temp = cpu["temp"]
+    cpu_percent = cpu["percent"]
+    gpu_temp = gpu["temp"]
+    gpu_util = gpu["util"]
+    mem_percent = mem["percent"]
+
+    # Top bar text (CPU temp, GPU temp, RAM usage only)
+    top_text = (
+        f"{CPU_ICON} {color_text(max_cpu_temp, 'cpu_gpu_temp', '.0f')}°C  "
+        f"{GPU_ICON} {color_text(gpu_temp, 'cpu_gpu_temp')}°C  "
+        f"{MEM_ICON} {color_text(mem_percent, 'mem_storage', '.0f')}%"
+    )
+
+    tooltip_lines = []
+
+    # CPU
+    cpu_current, cpu_max, cpu_power = cpu["current"], cpu["max"], cpu["power"]
+    tooltip_lines.append(f"<span foreground='{PINK}'>{CPU_ICON} CPU:</span>{stale_marker(stale, 'cpu')}")
+    tooltip_lines.append(f"Type: AMD Ryzen 7 5800X3D")
+    tooltip_lines.append(f"Freq: {color_text(cpu_current, 'cpu_power', '.0f')} / {cpu_max:.0f} MHz")
+    tooltip_lines.append(f"Temp: {color_text(max_cpu_temp, 'cpu_gpu_temp', '.1f' if max_cpu_temp else '')}°C")
+    tooltip_lines.append(f"Power: {color_text(cpu_power, 'cpu_power', '.1f')} W")
+    tooltip_lines.append(f"Util: {color_text(cpu_percent, 'cpu_power', '.0f')}%")
+    tooltip_lines.append("─"*30)
+
+    # GPU
+    gpu_freq, gpu_max_freq, gpu_power = gpu["freq"], gpu["max_freq"], gpu["power"]
+    tooltip_lines.append(f"<span foreground='{PINK}'>{GPU_ICON} GPU:</span>{stale_marker(stale, 'gpu')}")
+    tooltip_lines.append(f"Type: {gpu['name']}")
+    tooltip_lines.append(f"Freq: {color_text(gpu_freq, 'gpu_power')} / {gpu_max_freq} MHz")
+    tooltip_lines.append(f"Temp: {color_text(gpu_temp, 'cpu_gpu_temp')}°C")
+    tooltip_lines.append(f"Power: {color_text(gpu_power, 'gpu_power', '.1f')} W")
+    tooltip_lines.append(f"Util: {color_text(gpu_util, 'gpu_power')}%")
+    tooltip_lines.append("─"*30)
+
+    # RAM
+    mem_used, mem_total = mem["used"], mem["total"]
+    tooltip_lines.append(f"<span foreground='{PINK}'>{MEM_ICON} RAM:</span>{stale_marker(stale, 'ram')}")
+    tooltip_lines.append(f"Usage: {mem_used:.1f}/{mem_total:.1f} GB ({color_text(mem_percent, 'mem_storage', '.0f')}%)")
+    if dimm_temps:
+        for i, t in enumerate(dimm_temps[:4]):  # Limit to 4 slots
+            tooltip_lines.append(f"Slot {i+1}: Temp {color_text(t, 'cpu_gpu_temp', '.0f')}°C")
+    tooltip_lines.append("─"*30)
+
+    # Storage
+    tooltip_lines.append(f"<span foreground='{PINK}'>{SSD_ICON} Storage:</span>{stale_marker(stale, 'storage')}")
+    for icon, name, usage, (read, written) in storage_entries:
+        if usage is None:
+            continue
+        line = f"{icon} {name}: {color_text(usage, 'mem_storage', '.0f')}%"
+        if read is not None and written is not None:
+            line += f"  R {format_rate(read)} W {format_rate(written)}"
+        tooltip_lines.append(line)
+    tooltip_lines.append("─"*30)
+
+    # Min/avg/max and trend of the last few minutes
+    if history:
+        tooltip_lines.append(f"<span foreground='{PINK}'>󰄨 Last {HISTORY_WINDOW // 60} min (min/avg/max):</span>")
+        tooltip_lines.extend(history)
+        tooltip_lines.append("─"*30)
+
+    # Collector timings and errors, with --stats
+    if debug:
+        tooltip_lines.extend(debug)
+        tooltip_lines.append("─"*30)
+
+    # Click hints
+    tooltip_lines.append("🖱️ LMB: Btop | 🖱️ RMB: CoolerControl")
+
+    return {
+        "text": top_text,
+        "tooltip": "\n".join(tooltip_lines),
+        "class": "custom-system-monitor",
+        "percentage": int(max(cpu_percent, gpu_util, mem_percent))
+    }
 
 # ---------------------------
-# OUTPUT
+# SCHEDULER
 # ---------------------------
-TERMINAL = os.environ.get("TERMINAL") or shutil.which("alacritty") or shutil.which("kitty") or "xterm"
-click_type = os.environ.get("WAYBAR_CLICK_TYPE")
-
-if click_type == "left":
-    subprocess.Popen([TERMINAL, "-e", "btop"])
-elif click_type == "right":
-    subprocess.Popen(["coolercontrol"])
-
-output = {
-    "text": top_text,
-    "tooltip": "\n".join(tooltip_lines),
-    "class": "custom-system-monitor",
-    "percentage": int(max(cpu_percent, gpu_util, mem_percent))
+# Every collector declares how often its value can change and how long a
+# tick waits for it. Period 0 means every tick; slower collectors only run
+# once their period is up and render() uses their latest value. Collectors
+# with a deadline run in the worker pool, in parallel, so one slow sensor
+# cannot delay the others; a deadline of None runs inline first, which keeps
+# the mount list current for the disk collectors. A collector with a trigger
+# (see watch_mounts) runs when trigger.changed() says so instead of on its period.
+#   name: (period in seconds, deadline in seconds)
+SCHEDULE = {
+    "cpu": (0, 0.5),
+    "gpu": (0, 1.0),            # rocm-smi alone may take up to its 2s timeout
+    "memory": (0, 0.5),
+    "dimm_temps": (30, 0.5),
+    "mounts": (60, None),       # One read of mountinfo, never blocks; on mount changes when watched
+    "disk_io": (0, 0.5),        # One read of /proc/diskstats
+    "disk_usage": (30, 1.0),    # statvfs() per mount, can hang on network filesystems
 }
+# Tooltip section each collector belongs to, for staleness markers
+SECTIONS = {"cpu": "cpu", "gpu": "gpu", "memory": "ram", "dimm_temps": "ram",
+            "mounts": "storage", "disk_io": "storage", "disk_usage": "storage"}
+POOL_SIZE = 4
+
+class WorkerPool:
+    """A few daemon threads running collectors.
+
+    Unlike ThreadPoolExecutor, a worker stuck in a hung statfs() or sensor
+    read never keeps the process from exiting.
+    """
+
+    def __init__(self, size=POOL_SIZE):
+        import queue
+        import threading
+        self.jobs = queue.SimpleQueue()
+        self.size = size
+        for _ in range(size):
+            threading.Thread(target=self.work, daemon=True).start()
+
+    def close(self):
+        """Let the workers exit once they are done with their current job."""
+        for _ in range(self.size):
+            self.jobs.put(None)
+
+    def submit(self, fn):
+        from concurrent.futures import Future
+        future = Future()
+        self.jobs.put((future, fn))
+        return future
+
+    def work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            future, fn = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+
+class Monitor:
+    """The latest value of every collector and when it last ran.
+
+    A collector that misses its deadline keeps running in the background and
+    its previous value is shown, marked stale, until it finishes. It is not
+    started again while it is still running.
+
+    Pooled collectors finish on worker threads. Under run() their results are
+    handed back to the event loop; otherwise the lock keeps finish() from
+    changing the tables while a tick reads them.
+    """
+
+    def __init__(self, sampler, sensors, gpu_backend, state=None, history=None, triggers=None, pool=None):
+        collectors = {
+            "cpu": lambda: collect_cpu(sampler, sensors),
+            "gpu": lambda: collect_gpu(gpu_backend),
+            "memory": collect_memory,
+            "dimm_temps": lambda: collect_dimm_temps(sensors),
+            "mounts": collect_mounts,
+            "disk_io": lambda: collect_disk_io(sampler, self.values.get("mounts", [])),
+            "disk_usage": lambda: collect_disk_usage(self.values.get("mounts", [])),
+        }
+        self.collectors = {name: stats.timed(name, fn) for name, fn in collectors.items()}
+        state = state or {}
+        self.values = state.get("values", {})
+        self.collected = state.get("collected", {})  # Wall-clock time, valid across runs
+        self.inflight = {}
+        self.late = set()  # Missed their deadline or failed on the last attempt
+        self.pool = pool or WorkerPool()
+        self.own_pool = pool is None
+        self.gpu_backend = gpu_backend
+        self.history = history
+        self.triggers = triggers or {}
+        import threading
+        self.lock = threading.Lock()
+        self.loop = None  # Set while run() drives the monitor
+
+    def close(self):
+        """Release the GPU backend, the history map, the trigger watches and a pool of our own."""
+        self.gpu_backend.close()
+        if self.history is not None:
+            self.history.close()
+        for trigger in self.triggers.values():
+            trigger.close()
+        if self.own_pool:
+            self.pool.close()
+
+    def state(self):
+        """Slow values for the next one-shot run."""
+        slow = [name for name, (period, _) in SCHEDULE.items() if period]
+        with self.lock:
+            return {"values": {n: self.values[n] for n in slow if n in self.values},
+                "collected": {n: self.collected[n] for n in slow if n in self.collected}}
+
+    def due(self, now):
+        due = []
+        for name, (period, _) in SCHEDULE.items():
+            if name in self.inflight:
+                continue
+            trigger = self.triggers.get(name)
+            if name not in self.values or (trigger.changed() if trigger else now - self.collected.get(name, 0) >= period):
+                due.append(name)
+        return due
+
+    def done(self, name, now, future):
+        """Done-callback of a pooled collector, runs on its worker thread."""
+        if self.loop is not None:
+            try:
+                self.loop.call_soon_threadsafe(self.finish, name, now, future)
+                return
+            except RuntimeError:
+                pass  # The loop has closed
+        self.finish(name, now, future)
+
+    def finish(self, name, now, future):
+        with self.lock:
+            self.inflight.pop(name, None)
+            try:
+                self.values[name] = future.result()
+                self.collected[name] = now
+                self.late.discard(name)
+            except:
+                self.late.add(name)
+
+    def start(self, now):
+        """Run what is due; return (name, future, deadline) for the pooled collectors."""
+        started = []
+        due = self.due(now)
+        mounts = self.values.get("mounts")
+        for name in due:
+            if SCHEDULE[name][1] is None:
+                try:
+                    value = self.collectors[name]()
+                    with self.lock:
+                        self.values[name] = value
+                        self.collected[name] = now
+                        self.late.discard(name)
+                except:
+                    with self.lock:
+                        self.late.add(name)
+        # A new mount shows its usage right away instead of at the next period
+        if self.values.get("mounts") != mounts and "disk_usage" not in due and "disk_usage" not in self.inflight:
+            due.append("disk_usage")
+        clock = time.monotonic()
+        for name in due:
+            deadline = SCHEDULE[name][1]
+            if deadline is not None:
+                with self.lock:
+                    future = self.inflight[name] = self.pool.submit(self.collectors[name])
+                future.add_done_callback(lambda f, name=name: self.done(name, now, f))
+                started.append((name, future, clock + deadline))
+        return started
+
+    def expire(self, started):
+        with self.lock:
+            for name, future, _ in started:
+                if not future.done():
+                    self.late.add(name)
+
+    def render(self, now):
+        with self.lock:
+            late, collected, v = list(self.late), dict(self.collected), dict(self.values)
+        stale = {}
+        for name in late:
+            section = SECTIONS[name]
+            age = now - collected[name] if name in collected else None
+            stale[section] = max(stale.get(section) or 0, age) if age is not None else None
+        cpu, gpu, mem = v.get("cpu") or empty_cpu(), v.get("gpu") or empty_gpu(), v.get("memory") or empty_memory()
+        lines = None
+        if self.history is not None:
+            self.history.record(now, {
+                "cpu_percent": cpu["percent"], "cpu_power": cpu["power"], "cpu_temp": cpu["temp"],
+                "gpu_util": gpu["util"], "gpu_temp": gpu["temp"], "mem_percent": mem["percent"],
+            })
+            lines = history_lines(self.history, now)
+        usage, io = v.get("disk_usage", {}), v.get("disk_io", {})
+        storage = [(m["icon"], m["name"], usage.get(m["mountpoint"]), io.get(m["device"], (None, None)))
+                   for m in v.get("mounts", [])]
+        return render(cpu, gpu, mem, v.get("dimm_temps", []), storage, stale, lines,
+                      stats.tooltip_lines(SCHEDULE))
+
+    def sample(self):
+        now = time.time()
+        started = self.start(now)
+        for _, future, deadline in started:
+            try:
+                future.result(max(0, deadline - time.monotonic()))
+            except:
+                pass
+        self.expire(started)
+        return self.render(now)
+
+    async def run(self, interval, emit):
+        """Call emit() with a new output every `interval` seconds, forever."""
+        import asyncio
+        loop = self.loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            now = time.time()
+            started = self.start(now)
+            for _, future, deadline in sorted(started, key=lambda s: s[2]):
+                await asyncio.wait([asyncio.wrap_future(future)], timeout=max(0, deadline - time.monotonic()))
+            self.expire(started)
+            emit(self.render(now))
+            # After a tick that ran into deadlines, skip ahead instead of bursting
+            next_tick = max(next_tick + interval, loop.time())
+            await asyncio.sleep(next_tick - loop.time())
+
+# ---------------------------
+# OUTPUT
+# ---------------------------
+def handle_click():
+    click_type = os.environ.get("WAYBAR_CLICK_TYPE")
+    if not click_type:
+        return
+
+    import shutil
+    import subprocess
+    TERMINAL = os.environ.get("TERMINAL") or shutil.which("alacritty") or shutil.which("kitty") or "xterm"
+
+    if click_type == "left":
+        subprocess.Popen([TERMINAL, "-e", "btop"])
+    elif click_type == "right":
+        subprocess.Popen(["coolercontrol"])
+
+def stream(interval, gpu):
+    import asyncio
+    sensors = discover_sensors()
+    monitor = Monitor(Sampler(), sensors, make_gpu_backend(gpu, sensors, keep_open=True, interval=interval),
+                      history=open_history(), triggers=watch_mounts())
+
+    def emit(output):
+        sys.stdout.write(json.dumps(output) + "\n")
+        sys.stdout.flush()
+
+    asyncio.run(monitor.run(interval, emit))
+
+def parse_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stream", action="store_true",
+                        help="Stay resident and print one JSON line per tick")
+    parser.add_argument("--interval", type=float, default=STREAM_INTERVAL,
+                        help="Seconds between lines in --stream mode")
+    parser.add_argument("--gpu", choices=["auto", *GPU_BACKENDS], default="auto",
+                        help="GPU backend (rocm-smi forks the ROCm tool on every sample)")
+    parser.add_argument("--stats", action="store_true",
+                        help="Time every collector and show p50/p99 and errors in the tooltip")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Report import costs and time to the first JSON line, then exit")
+    return parser.parse_args()
+
+def main():
+    arguments = parse_arguments()
+    if arguments.profile_startup:
+        import startup
+        sys.exit(startup.profile(__file__, [a for a in sys.argv[1:] if a != "--profile-startup"],
+                                 STARTUP_BUDGET_MS))
+    if arguments.stats:
+        stats.enable()
+    if arguments.stream:
+        try:
+            stream(arguments.interval, arguments.gpu)
+        except (KeyboardInterrupt, BrokenPipeError):
+            pass
+        return
+
+    handle_click()
+    state = load_state()
+    sampler = Sampler(state.get("counters"))
+    sensors = load_sensors()
+    monitor = Monitor(sampler, sensors, make_gpu_backend(arguments.gpu, sensors), state.get("monitor"),
+                      open_history())
+    output = monitor.sample()
+    # A collector past its deadline may still be updating the counters
+    save_state({"counters": dict(sampler.prev), "monitor": monitor.state()})
+    print(json.dumps(output))
 
-print(json.dumps(output))
\ No newline at end of file
+if __name__ == "__main__":
+    main()
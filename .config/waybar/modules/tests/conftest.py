@@ -0,0 +1,14 @@
+import importlib.util
+import os
+import sys
+
+MODULE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, MODULE_DIR)
+
+def load_script(filename):
+    """Import a module script by file name (sys-mon.py is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location(filename[:-3].replace("-", "_"),
+                                                  os.path.join(MODULE_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
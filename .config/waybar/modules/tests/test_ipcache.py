@@ -0,0 +1,89 @@
+"""ipcache against a local ipinfo stand-in: single-flight, blocking lookups and backoff."""
+import http.server
+import importlib
+import json
+import threading
+import time
+
+import pytest
+
+import ipcache as ipcache_module
+import paths
+
+IPINFO = {"ip": "203.0.113.7", "city": "Oslo", "loc": "59.91,10.75"}
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    delay = 0.0
+    status = 200
+    hits = []
+
+    def do_GET(self):
+        type(self).hits.append(self.path)
+        time.sleep(self.delay)
+        body = json.dumps(IPINFO).encode()
+        self.send_response(self.status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    Handler.delay, Handler.status, Handler.hits = 0.0, 200, []
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def ipcache(tmp_path, server):
+    # CACHE_DIR and IPINFO_URL are read at import, as in a fresh process
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("XDG_CACHE_HOME", str(tmp_path))
+        mp.setenv("WAYBAR_IPINFO_URL", server + "/json")
+        mp.setenv("WAYBAR_WEATHER_URL", server + "/forecast?latitude={lat}&longitude={lon}")
+        importlib.reload(paths)
+        yield importlib.reload(ipcache_module)
+    importlib.reload(paths)
+    importlib.reload(ipcache_module)
+
+def test_refresh_is_single_flight(ipcache):
+    Handler.delay = 0.3
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ipcache.refresh())) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert Handler.hits == ["/json"]
+    assert sorted(results) == [False, False, False, True]
+    assert ipcache.read_cache()["data"] == IPINFO
+
+def test_blocking_lookup_waits_for_running_fetch(ipcache):
+    Handler.delay = 0.3
+    holder = threading.Thread(target=ipcache.refresh)
+    holder.start()
+    while not Handler.hits:  # The holder has the lock and is fetching
+        time.sleep(0.01)
+    assert ipcache.lookup(block=True) == IPINFO
+    holder.join()
+    assert Handler.hits == ["/json"]
+
+def test_failure_backs_off(ipcache):
+    Handler.status = 500
+    assert ipcache.lookup(block=True) is None
+    entry = ipcache.read_cache()
+    assert entry["failures"] == 1 and entry["retry_after"] > time.time()
+    assert ipcache.lookup(block=True) is None
+    ipcache.lookup(resident=True)
+    assert Handler.hits == ["/json"]  # No retry before retry_after
+
+def test_weather_without_location_does_not_fetch(ipcache):
+    Handler.status = 500
+    import weather
+    output = weather.build_output()
+    assert output["text"] == "N/A"
+    assert not any(path.startswith("/forecast") for path in Handler.hits)
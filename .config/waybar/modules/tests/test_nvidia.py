@@ -0,0 +1,48 @@
+"""parse_nvidia_csv and the --loop-ms reader against recorded nvidia-smi output."""
+import io
+import os
+
+import pytest
+
+import fixtures
+from conftest import load_script
+
+sys_mon = load_script("sys-mon.py")
+
+EXPECTED = {
+    "rtx4070": dict(name="NVIDIA GeForce RTX 4070", temp=54, power=87.32, util=41, freq=2310, max_freq=3105),
+    "not-available": dict(name="NVIDIA GeForce GTX 1650", temp=47, power=0.0, util=3, freq=300, max_freq=2100),
+    "not-supported": dict(name="Tesla K80", temp=38, power=26.14, util=0, freq=0, max_freq=875),
+    "comma-name": dict(name="NVIDIA RTX A2000 8GB Laptop GPU, Max-Q", temp=61, power=35.1, util=88,
+                       freq=1597, max_freq=2100),
+    "quoted-name": dict(name="NVIDIA RTX A2000 8GB Laptop GPU, Max-Q", temp=61, power=35.1, util=88,
+                        freq=1597, max_freq=2100),
+    "truncated": None,
+    "truncated-comma-name": None,
+}
+
+@pytest.mark.parametrize("row", fixtures.NVIDIA_CSV)
+def test_parse_recorded_row(row):
+    assert sys_mon.parse_nvidia_csv(fixtures.NVIDIA_CSV[row]) == EXPECTED[row]
+
+def test_loop_stream_keeps_last_complete_row():
+    class Proc:
+        stdout = io.StringIO(fixtures.NVIDIA_LOOP)
+
+    backend = sys_mon.NvidiaBackend({})
+    backend.nvml = None
+    backend.read_loop(Proc())
+    assert backend.latest == dict(name="NVIDIA GeForce RTX 4070", temp=56, power=151.06, util=99,
+                                  freq=2670, max_freq=3105)
+
+def test_loop_against_stub(tmp_path, monkeypatch):
+    root = fixtures.build("intel-rapl", str(tmp_path))
+    monkeypatch.setenv("PATH", f"{root}/bin:{os.environ.get('PATH', '')}")
+    backend = sys_mon.NvidiaBackend({}, keep_open=True, interval=0.1)
+    backend.nvml = None
+    try:
+        # Starts the --loop-ms child and waits for its first row
+        assert backend.sample() == EXPECTED["rtx4070"]
+        assert backend.sample() == EXPECTED["rtx4070"]
+    finally:
+        backend.close()
@@ -0,0 +1,76 @@
+"""Cold starts, run the way --profile-startup does (python -X importtime).
+
+Every module runs against a fixture tree with warm caches: the sensor index,
+the ipinfo lookup and a forecast that has not expired yet. By default only the
+imports are checked, since wall-clock budgets fail on a loaded machine;
+WAYBAR_STARTUP_BUDGETS=1 also checks the time to the first JSON line.
+"""
+import json
+import os
+import re
+import time
+
+import pytest
+
+import fixtures
+import startup
+from conftest import MODULE_DIR
+
+# script: arguments
+MODULES = {
+    "sys-mon.py": [],
+    "network-info.py": [],
+    "weather.py": [],
+}
+
+# Imports each script keeps off its warm start (see the comments at their tops);
+# psutil imports subprocess itself, so sys-mon can only defer its own GPU tools
+LAZY = {
+    "sys-mon.py": {"asyncio", "csv", "pynvml"},
+    "network-info.py": {"subprocess", "urllib.request"},
+    "weather.py": {"subprocess", "urllib.request", "requests"},
+}
+
+def budget(script):
+    """The STARTUP_BUDGET_MS the script documents for itself."""
+    with open(os.path.join(MODULE_DIR, script)) as f:
+        return int(re.search(r"^STARTUP_BUDGET_MS = (\d+)", f.read(), re.M).group(1))
+
+@pytest.fixture
+def warm_env(tmp_path, monkeypatch):
+    root = fixtures.build("amd-nct6687", str(tmp_path / "root"))
+    cache = tmp_path / "cache" / "waybar"
+    runtime = tmp_path / "run"
+    cache.mkdir(parents=True)
+    runtime.mkdir()
+    monkeypatch.setenv("WAYBAR_FS_ROOT", root)
+    monkeypatch.setenv("PATH", f"{root}/bin:{os.environ.get('PATH', '')}")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(runtime))
+    # Nothing may reach the network: a stale cache would fetch in the background
+    monkeypatch.setenv("WAYBAR_IPINFO_URL", "http://127.0.0.1:9/")
+    monkeypatch.setenv("WAYBAR_WEATHER_URL", "http://127.0.0.1:9/?{lat}{lon}")
+
+    now = time.time()
+    (cache / "ipinfo.json").write_text(json.dumps({"data": fixtures.IPINFO, "fetched": now}))
+    lat, lon = map(float, fixtures.IPINFO["loc"].split(","))
+    (cache / f"forecast-{lat:.2f},{lon:.2f}.json").write_text(
+        json.dumps({"data": fixtures.forecast(), "fetched": now, "expires": now + 3600}))
+    return root
+
+@pytest.mark.parametrize("script", MODULES)
+def test_warm_start_skips_lazy_imports(warm_env, script):
+    first_line, _, stderr = startup.run(os.path.join(MODULE_DIR, script), MODULES[script])
+    assert json.loads(first_line)
+    imported = {name for name, _ in startup.parse_importtime(stderr, nested=True)}
+    assert not imported & LAZY[script]
+
+@pytest.mark.skipif(not os.environ.get("WAYBAR_STARTUP_BUDGETS"),
+                    reason="wall-clock budgets, set WAYBAR_STARTUP_BUDGETS=1 on an idle machine")
+@pytest.mark.parametrize("script", MODULES)
+def test_first_json_line_within_budget(warm_env, script, capsys):
+    path = os.path.join(MODULE_DIR, script)
+    # One run to warm the page cache and the sensor index
+    startup.profile(path, MODULES[script], budget(script))
+    capsys.readouterr()
+    assert startup.profile(path, MODULES[script], budget(script)) == 0, capsys.readouterr().out
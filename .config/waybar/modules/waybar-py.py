@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""One resident process hosting every custom waybar module.
+
+`waybar-py.py serve` loads sys-mon, network-info, weather and mediaplayer as
+plugins of a single asyncio loop, each on its own schedule, so they share one
+interpreter, one set of imports and in-process caches such as ipcache's
+external IP lookup. Every plugin publishes its JSON lines on a Unix socket in
+$XDG_RUNTIME_DIR/waybar-py/.
+
+The server is started once, from hypr/autostart.conf. waybar relays each
+module with `socat -u UNIX-CONNECT:$XDG_RUNTIME_DIR/waybar-py/NAME.sock -`,
+so no Python runs per module; "restart-interval" reconnects it when the
+server restarts. `waybar-py.py client NAME` does the same relaying and starts
+the server if needed, for setups without socat.
+
+A failing plugin is restarted with exponential backoff, and given up on after
+IMPORT_ATTEMPTS import failures in a row (e.g. gi missing for spotify). The
+server keeps running module code as it was loaded: after editing a module, run
+`uwsm-app -- waybar-py.py serve --replace` to restart it in place, or
+`waybar-py.py stop` to stop it.
+"""
+# The client path must stay cheap: only these imports are loaded for it
+import os
+import sys
+import socket
+import time
+
+from paths import RUNTIME_DIR
+
+SOCKET_DIR = os.path.join(RUNTIME_DIR, "waybar-py")
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+RECONNECT_DELAY = 0.5
+LOG_MAX = 1024 * 1024  # server.log is started over once it is larger
+
+def socket_path(name):
+    return os.path.join(SOCKET_DIR, f"{name}.sock")
+
+def lock_path():
+    return os.path.join(SOCKET_DIR, "server.lock")
+
+# ---------------------------
+# CLIENT
+# ---------------------------
+def start_server():
+    import subprocess
+    os.makedirs(SOCKET_DIR, exist_ok=True)
+    log_path = os.path.join(SOCKET_DIR, "server.log")
+    try:
+        mode = "w" if os.path.getsize(log_path) > LOG_MAX else "a"
+    except OSError:
+        mode = "a"
+    with open(log_path, mode) as log:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve"],
+                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=log,
+                         start_new_session=True)
+
+def client(name):
+    spawned = False
+    while True:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(socket_path(name))
+        except OSError:
+            sock.close()
+            # The server holds a lock, so concurrent clients starting it is harmless
+            if not spawned:
+                start_server()
+                spawned = True
+            time.sleep(RECONNECT_DELAY)
+            continue
+
+        spawned = False
+        with sock:
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                os.write(sys.stdout.fileno(), data)
+        time.sleep(RECONNECT_DELAY)
+
+# ---------------------------
+# SERVER
+# ---------------------------
+def load_module(filename):
+    """Import one of the module scripts (their names are not valid identifiers)."""
+    import importlib.util
+    name = filename[:-3].replace("-", "_")
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(MODULE_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except:
+        del sys.modules[name]
+        raise
+    return module
+
+class Channel:
+    """The latest line of one module and every client connected to its socket."""
+
+    def __init__(self, name):
+        self.name = name
+        self.last = None
+        self.writers = set()
+
+    def publish(self, line):
+        self.last = line
+        data = (line + "\n").encode()
+        for writer in list(self.writers):
+            if writer.is_closing():
+                self.writers.discard(writer)
+            else:
+                writer.write(data)
+
+    async def handle(self, reader, writer):
+        # A new bar gets the current state right away instead of waiting a tick
+        if self.last is not None:
+            writer.write((self.last + "\n").encode())
+        self.writers.add(writer)
+        try:
+            await reader.read()  # Clients never send anything, EOF means they left
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+async def ticks(interval):
+    """Yield on a fixed schedule without drifting by the time each tick takes."""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    next_tick = loop.time()
+    while True:
+        yield
+        next_tick += interval
+        await asyncio.sleep(max(0, next_tick - loop.time()))
+
+_sys_mon_pool = None  # Outlives restarts, a worker stuck in statfs() is not started twice
+
+async def run_sys_mon(publish, interval):
+    global _sys_mon_pool
+    import json
+    sys_mon = load_module("sys-mon.py")
+    if _sys_mon_pool is None:
+        _sys_mon_pool = sys_mon.WorkerPool()
+    sensors = sys_mon.discover_sensors()
+    gpu_backend = sys_mon.make_gpu_backend("auto", sensors, keep_open=True, interval=interval)
+    monitor = sys_mon.Monitor(sys_mon.Sampler(), sensors, gpu_backend, history=sys_mon.open_history(),
+                              triggers=sys_mon.watch_mounts(), pool=_sys_mon_pool)
+    try:
+        await monitor.run(interval, lambda output: publish(json.dumps(output)))
+    finally:
+        # A restart builds everything again, nothing of this instance may linger
+        monitor.close()
+
+async def run_network(publish, interval):
+    import asyncio
+    import json
+    net = load_module("network-info.py")
+    throughput = net.Throughput()
+    network = net.NetworkState()
+    changed = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    if network.sock is not None:
+        loop.add_reader(network.sock, lambda: network.handle_events() and changed.set())
+
+    try:
+        next_tick = loop.time()
+        while True:
+            counters = {name: net.get_bytes(name) for name in network.interfaces}
+            throughput.add(time.monotonic(), counters)
+            publish(json.dumps(net.build_output(throughput, network)))
+            next_tick += interval
+            # A link or address change publishes right away, like the standalone script
+            try:
+                await asyncio.wait_for(changed.wait(), max(0, next_tick - loop.time()))
+                changed.clear()
+                next_tick -= interval
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        if network.sock is not None:
+            loop.remove_reader(network.sock)
+        network.close()
+
+async def run_weather(publish, interval):
+    import asyncio
+    import json
+    weather = load_module("weather.py")
+    loop = asyncio.get_running_loop()
+    async for _ in ticks(interval):
+        # Served from the forecast cache, so frequent ticks are cheap and pick
+        # up background refreshes quickly
+        output = await loop.run_in_executor(None, weather.build_output, True)
+        publish(json.dumps(output, ensure_ascii=False))
+
+async def run_mediaplayer(publish, player):
+    import asyncio
+    import threading
+    mediaplayer = load_module("mediaplayer.py")
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+
+    def run():
+        # GLib gets its own thread; lines hop back onto the asyncio loop
+        try:
+            manager = mediaplayer.PlayerManager(
+                player, None, output=lambda line: loop.call_soon_threadsafe(publish, line),
+                album_art=True)
+            manager.run()
+            loop.call_soon_threadsafe(done.set_result, None)
+        except Exception as e:
+            loop.call_soon_threadsafe(done.set_exception, e)
+
+    threading.Thread(target=run, daemon=True).start()
+    await done
+
+# name: (plugin, schedule argument)
+PLUGINS = {
+    "sys-mon": (run_sys_mon, 5),
+    "network": (run_network, 2),
+    "weather": (run_weather, 60),
+    "spotify": (run_mediaplayer, "spotify"),
+}
+
+RESTART_DELAY = 5  # Seconds before the first restart, doubled per failure
+RESTART_MAX = 600
+STABLE_RUN = 60  # A plugin that ran this long starts over at RESTART_DELAY
+IMPORT_ATTEMPTS = 3  # Import failures in a row before a plugin is given up on
+
+async def supervise(name, plugin, arg, channel, logger):
+    import asyncio
+    loop = asyncio.get_running_loop()
+    delay = RESTART_DELAY
+    import_failures = 0
+    while True:
+        started = loop.time()
+        try:
+            await plugin(channel.publish, arg)
+            logger.warning(f"{name} stopped")
+        except asyncio.CancelledError:
+            raise
+        except ImportError:
+            import_failures += 1
+            if import_failures >= IMPORT_ATTEMPTS:
+                logger.exception(f"{name} cannot be imported, giving up")
+                return
+            logger.exception(f"{name} failed to import")
+        except Exception:
+            import_failures = 0
+            logger.exception(f"{name} failed")
+        if loop.time() - started >= STABLE_RUN:
+            delay = RESTART_DELAY
+        logger.info(f"Restarting {name} in {delay} s")
+        await asyncio.sleep(delay)
+        delay = min(RESTART_MAX, delay * 2)
+
+async def serve(names):
+    import asyncio
+    import logging
+    import signal
+    logger = logging.getLogger("waybar-py")
+    # SIGTERM (stop, --replace, logout) cancels the plugins so their cleanup runs
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    tasks = []
+    for name in names:
+        channel = Channel(name)
+        path = socket_path(name)
+        if os.path.exists(path):
+            os.unlink(path)
+        await asyncio.start_unix_server(channel.handle, path)
+        plugin, arg = PLUGINS[name]
+        tasks.append(asyncio.create_task(supervise(name, plugin, arg, channel, logger)))
+    await asyncio.gather(*tasks)
+
+def stop(timeout=5):
+    """SIGTERM the running server and wait for it to exit. Returns False if none was running."""
+    import fcntl
+    import signal
+    os.makedirs(SOCKET_DIR, exist_ok=True)
+    with open(lock_path(), "a+") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return False  # Nobody holds it, so the pid in it is stale
+        except BlockingIOError:
+            pass
+        lock.seek(0)
+        try:
+            os.kill(int(lock.read()), signal.SIGTERM)
+        except (OSError, ValueError):
+            return False
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                time.sleep(0.1)
+    return True
+
+def server(names, replace=False):
+    import asyncio
+    import fcntl
+    import logging
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
+
+    if replace:
+        stop()
+    os.makedirs(SOCKET_DIR, exist_ok=True)
+    lock = open(lock_path(), "a+")  # Not "w", that would wipe the running server's pid
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return  # Already running
+    lock.truncate(0)
+    lock.write(str(os.getpid()))
+    lock.flush()
+    try:
+        asyncio.run(serve(names))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_parser = sub.add_parser("serve", help="Run the plugins and publish their output")
+    serve_parser.add_argument("--only", help="Comma-separated list of plugins to run")
+    serve_parser.add_argument("--replace", action="store_true", help="Stop a running server first")
+    sub.add_parser("stop", help="Stop the running server")
+    client_parser = sub.add_parser("client", help="Relay one plugin's output to stdout")
+    client_parser.add_argument("name", choices=PLUGINS)
+    arguments = parser.parse_args()
+
+    if arguments.command == "client":
+        try:
+            client(arguments.name)
+        except (KeyboardInterrupt, BrokenPipeError):
+            pass
+    elif arguments.command == "stop":
+        sys.exit(0 if stop() else 1)
+    else:
+        names = arguments.only.split(",") if arguments.only else list(PLUGINS)
+        server(names, arguments.replace)
+
+if __name__ == "__main__":
+    main()
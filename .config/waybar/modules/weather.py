@@ -1,37 +1,175 @@
 #!/usr/bin/env python3
-import requests
+# Cold-start budget: 100 ms to the JSON line with a cached forecast (check with
+# --profile-startup). requests and subprocess are only imported to fetch/refresh.
 import json
+import os
 import sys
-from datetime import datetime, timedelta
-import calendar
-import re
+import time
+import fcntl
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
 
-# ---------------- AUTO-LOCATION VIA IP
-def get_location_by_ip():
-    try:
-        r = requests.get("https://ipinfo.io/json", timeout=5)
-        r.raise_for_status()
-        data = r.json()
-        loc = data.get("loc", "0,0").split(",")
-        lat, lon = float(loc[0]), float(loc[1])
-        city = data.get("city", "Your Location")
-        return lat, lon, city
-    except Exception:
-        return 0.0, 0.0, "Your Location"
+import colors
+import ipcache
+import stats
+from paths import CACHE_DIR, atomic_write
+
+# ---------------- AUTO-LOCATION VIA IP (shared with network-info.py)
+def get_location_by_ip(resident=False):
+    location = ipcache.get_location(block=True, resident=resident)
+    if location is None:
+        # Not a forecast for 0,0 that would stay cached for the hour
+        fail("Location unknown, retrying later")
+    return location
 
-LAT, LON, LOCATION_NAME = get_location_by_ip()
 DAYS_FORECAST = 3  # Reduced from 5 to 3
+STARTUP_BUDGET_MS = 100
+STATS = ("ipinfo", "forecast")  # Shown in the tooltip with --stats
 
-URL = (
-    f"https://api.open-meteo.com/v1/forecast?"
-    f"latitude={LAT}&longitude={LON}"
-    f"&current_weather=true"
-    f"&hourly=temperature_2m,apparent_temperature,weathercode,"
-    f"relativehumidity_2m,windspeed_10m,precipitation_probability,precipitation"
-    f"&daily=temperature_2m_max,temperature_2m_min,weathercode,precipitation_sum"
-    f"&timezone=auto"
+# Extra sites shown in the tooltip next to the IP-based location, fetched
+# together in one request, e.g. [("Office", 59.91, 10.75), ("DC", 50.11, 8.68)]
+LOCATIONS = []
+WAYBAR_SIGNAL = 12  # custom/weather "signal", sent after a background refresh
+
+# Only the fields the tooltip renders, and only today plus the forecast days.
+# WAYBAR_WEATHER_URL replaces it (keeping {lat} and {lon}), e.g. for a local test server.
+URL = os.environ.get("WAYBAR_WEATHER_URL") or (
+    "https://api.open-meteo.com/v1/forecast?"
+    "latitude={lat}&longitude={lon}"
+    "&current_weather=true"
+    "&hourly=temperature_2m,apparent_temperature,weathercode,"
+    "relativehumidity_2m,windspeed_10m,precipitation_probability,precipitation"
+    "&daily=temperature_2m_max,temperature_2m_min,weathercode"
+    f"&forecast_days={DAYS_FORECAST + 1}"
+    "&timezone=auto"
 )
 
+# ---------------- FORECAST CACHE
+def cache_path(lat, lon):
+    # ~1 km grid, the same spot always maps to the same file
+    return os.path.join(CACHE_DIR, f"forecast-{lat:.2f},{lon:.2f}.json")
+
+def load_forecast(lat, lon):
+    try:
+        with open(cache_path(lat, lon)) as f:
+            return json.load(f)
+    except:
+        return None
+
+def forecast_expiry(data, fetched):
+    """The forecast only changes per hourly step, so it stays valid until the next one starts."""
+    step = 3600
+    try:
+        times = data["hourly"]["time"]
+        step = int((datetime.fromisoformat(times[1]) - datetime.fromisoformat(times[0])).total_seconds()) or step
+    except:
+        pass
+    return (int(fetched) // step + 1) * step
+
+def store_forecast(lat, lon, entry):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    atomic_write(cache_path(lat, lon), json.dumps(entry))
+
+def fetch_forecasts(coords):
+    """Download every (lat, lon) in one request and cache each result; returns the entries.
+
+    Open-Meteo takes comma-separated coordinates and answers with a list,
+    in the same order, when more than one location is asked for.
+    """
+    url = URL.format(lat=",".join(str(lat) for lat, _ in coords),
+                     lon=",".join(str(lon) for _, lon in coords))
+    import requests
+    r = requests.get(url, timeout=10)
+    r.raise_for_status()
+    results = r.json()
+    if isinstance(results, dict):
+        results = [results]
+
+    fetched = time.time()
+    entries = {}
+    for (lat, lon), data in zip(coords, results):
+        entry = {"data": data, "fetched": fetched, "expires": forecast_expiry(data, fetched)}
+        store_forecast(lat, lon, entry)
+        entries[(lat, lon)] = entry
+    return entries
+
+def fetch_or_back_off(coords):
+    """fetch_forecasts(), recording a failure in each entry so retries back off like ipcache's."""
+    try:
+        return stats.timed("forecast", fetch_forecasts)(coords)
+    except Exception:
+        for lat, lon in coords:
+            store_forecast(lat, lon, ipcache.backoff(load_forecast(lat, lon) or {}))
+        raise
+
+def needs_refresh(entry, now):
+    return now >= entry.get("expires", 0) and not ipcache.in_backoff(entry)
+
+def refresh_forecasts(coords, notify=True):
+    """Background refresh, single-flight across processes via flock."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(os.path.join(CACHE_DIR, "forecast.lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        now = time.time()
+        coords = [(lat, lon) for lat, lon in coords if needs_refresh(load_forecast(lat, lon) or {}, now)]
+        if not coords:
+            return
+        try:
+            fetch_or_back_off(coords)
+        except Exception:
+            return
+    if notify:
+        # Let waybar re-run us right away instead of at the next interval
+        import subprocess
+        subprocess.run(["pkill", f"-RTMIN+{WAYBAR_SIGNAL}", "-x", "waybar"],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+_inflight = None  # Background refresh thread of a resident process
+
+def revalidate(coords, resident):
+    global _inflight
+    if resident:
+        # The host picks the new forecast up on its next tick, no signal needed
+        import threading
+        if _inflight is None or not _inflight.is_alive():
+            _inflight = threading.Thread(target=refresh_forecasts, args=(coords, False), daemon=True)
+            _inflight.start()
+    else:
+        import subprocess
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "--refresh",
+                          *(f"{lat},{lon}" for lat, lon in coords)],
+                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, start_new_session=True)
+
+def get_forecasts(coords, resident=False):
+    """Forecast data for every (lat, lon), None where unavailable.
+
+    Cached entries are served instantly. Missing ones are fetched inline and
+    expired ones in the background (in a thread with resident=True), each
+    group with a single request. A failed fetch is not retried until the
+    entry's backoff is over.
+    """
+    entries = {c: load_forecast(*c) or {} for c in coords}
+    now = time.time()
+    missing = [c for c, entry in entries.items() if not entry.get("data") and not ipcache.in_backoff(entry)]
+    expired = [c for c, entry in entries.items() if entry.get("data") and needs_refresh(entry, now)]
+
+    if missing:
+        try:
+            entries.update(fetch_or_back_off(missing))
+        except Exception as e:
+            if not entries[coords[0]].get("data"):
+                fail(f"Failed to fetch weather: {e}")
+    if not entries[coords[0]].get("data"):
+        fail("Weather unavailable, retrying later")
+    if expired:
+        revalidate(expired, resident)
+    return [entries[c].get("data") for c in coords]
+
 # ---------------- WEATHER ICONS
 WEATHER_MAP = {
     0: ("☀️", "Clear sky"), 1: ("🌤️", "Mainly clear"), 2: ("⛅", "Partly cloudy"),
@@ -59,156 +197,235 @@ SHORT_DESC_MAP = {
 FG_HEADER = "#6acda2"  # Pink to match system monitor
 FG_TEXT = "#ffffff"
 
-TEMP_COLORS = [
-    (15, "#8caaee"), (18, "#85c1dc"), (21, "#99d1db"), (24, "#81c8be"),
-    (27, "#a6d189"), (30, "#e5c890"), (32, "#ef9f76"), (33, "#ea999c"), (100, "#e78284")
-]
-
 def temp_to_color(temp):
-    for t_max, color in TEMP_COLORS:
-        if temp <= t_max:
-            return color
-    return TEMP_COLORS[-1][1]
+    return colors.color(temp, "weather_temp")
+
+# ---------------- HOURLY INDEX
+def stamp(dt):
+    """Seconds since 0001-01-01 for a naive local datetime, cheap to compare and bisect."""
+    return dt.toordinal() * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second
+
+class HourlyForecast:
+    """The hourly block parsed once into columns.
+
+    `stamps` holds every time step as an integer in an array, and `days` maps
+    each date to its (start, end) index range, so every view of the forecast
+    is a binary search plus a slice instead of a scan over the time strings.
+    """
+
+    def __init__(self, hourly):
+        self.columns = hourly
+        self.stamps = array("q")
+        self.days = {}
+        day_ordinals = {}
+        for i, t in enumerate(hourly["time"]):
+            # "YYYY-MM-DDTHH:MM", only the date part needs real parsing (once per day)
+            day = t[:10]
+            if day not in day_ordinals:
+                d = date.fromisoformat(day)
+                day_ordinals[day] = d.toordinal() * 86400
+                self.days[d] = [i, i]
+            self.days[d][1] = i + 1
+            self.stamps.append(day_ordinals[day] + int(t[11:13]) * 3600 + int(t[14:16]) * 60)
+
+    def __len__(self):
+        return len(self.stamps)
+
+    def column(self, name, default=0):
+        return self.columns.get(name) or [default] * len(self)
+
+    def time(self, i):
+        return datetime.fromisoformat(self.columns["time"][i])
+
+    def index_at(self, dt):
+        """Index of the time step that contains dt."""
+        return max(0, bisect_right(self.stamps, stamp(dt)) - 1)
+
+    def index_from(self, dt):
+        """Index of the first time step starting at or after dt."""
+        return bisect_left(self.stamps, stamp(dt))
+
+    def day_range(self, d):
+        return tuple(self.days.get(d, (0, 0)))
+
 # ---------------- ERROR HANDLING
+class WeatherUnavailable(Exception):
+    pass
+
 def fail(msg="Weather unavailable"):
-    print(json.dumps({"text": "N/A", "tooltip": f"<span foreground='{FG_HEADER}'>{msg}</span>"}))
-    sys.exit(0)
+    raise WeatherUnavailable(msg)
 
-# ---------------- FETCH DATA
-try:
-    r = requests.get(URL, timeout=10)
-    r.raise_for_status()
-    data = r.json()
-except Exception as e:
-    fail(f"Failed to fetch weather: {e}")
-
-# ---------------- CURRENT WEATHER
-try:
-    current = data["current_weather"]
-    temp = current["temperature"]
-    code = current["weathercode"]
-    icon, desc = WEATHER_MAP.get(code, ("❓", "Unknown"))
-
-    hourly = data["hourly"]
-    times = hourly["time"]
-    apparent_temps = hourly.get("apparent_temperature", [temp]*len(times))
-    humidity_arr = hourly.get("relativehumidity_2m", [0]*len(times))
-    wind_arr = hourly.get("windspeed_10m", [0]*len(times))
-    rain_arr = hourly.get("precipitation_probability", [0]*len(times))
-
-    now = datetime.now()
-
-    current_index = 0
-    for i, t in enumerate(times):
-        dt = datetime.fromisoformat(t)
-        if dt.hour == now.hour and dt.date() == now.date():
-            current_index = i
+def unavailable_output(msg):
+    return {"text": "N/A", "tooltip": f"<span foreground='{FG_HEADER}'>{msg}</span>"}
+
+# ---------------- RENDER
+def render(data, location_name, site_data):
+    # Current weather
+    try:
+        current = data["current_weather"]
+        temp = current["temperature"]
+        code = current["weathercode"]
+        icon, desc = WEATHER_MAP.get(code, ("❓", "Unknown"))
+
+        hourly = HourlyForecast(data["hourly"])
+        apparent_temps = hourly.column("apparent_temperature", temp)
+        humidity_arr = hourly.column("relativehumidity_2m")
+        wind_arr = hourly.column("windspeed_10m")
+        rain_arr = hourly.column("precipitation_probability")
+
+        now = datetime.now()
+        current_index = hourly.index_at(now)
+        # Time steps left today, shared by the rain summary and the hourly list
+        today_start = hourly.index_from(now)
+        today_end = max(today_start, hourly.day_range(now.date())[1])
+
+        feels_like = apparent_temps[current_index]
+        humidity = humidity_arr[current_index]
+        windspeed = wind_arr[current_index]
+
+        text = f"{icon} <span foreground='{temp_to_color(temp)}'>{temp}°C</span>"
+
+    except Exception:
+        fail("Failed to parse current weather")
+
+    # Tooltip building (compact version)
+    tooltip_lines = []
+
+    # Current conditions - compact
+    tooltip_lines.append(f"<span foreground='{FG_HEADER}'>🌍 {location_name}</span>")
+    tooltip_lines.append(f"{icon} {desc} - <span foreground='{temp_to_color(temp)}'>{temp}°C</span> (Feels <span foreground='{temp_to_color(feels_like)}'>{feels_like}°C</span>)")
+    tooltip_lines.append(f"💧 {humidity}% | 🌬️ {windspeed} km/h")
+    tooltip_lines.append("─"*30)
+
+    # Rain info for today (if any)
+    rain_start_time = None
+    precip_arr = hourly.column("precipitation")
+    rain_probs_today = rain_arr[today_start:today_end]
+    precip_total = sum(precip_arr[today_start:today_end])
+    for i, prob in enumerate(rain_probs_today, today_start):
+        if prob > 0:
+            rain_start_time = hourly.time(i)
             break
 
-    feels_like = apparent_temps[current_index]
-    humidity = humidity_arr[current_index]
-    windspeed = wind_arr[current_index]
-
-    text = f"{icon} <span foreground='{temp_to_color(temp)}'>{temp}°C</span>"
-
-except Exception:
-    fail("Failed to parse current weather")
-
-# ---------------- TOOLTIP BUILDING (COMPACT VERSION)
-tooltip_lines = []
-
-# Current conditions - compact
-tooltip_lines.append(f"<span foreground='{FG_HEADER}'>🌍 {LOCATION_NAME}</span>")
-tooltip_lines.append(f"{icon} {desc} - <span foreground='{temp_to_color(temp)}'>{temp}°C</span> (Feels <span foreground='{temp_to_color(feels_like)}'>{feels_like}°C</span>)")
-tooltip_lines.append(f"💧 {humidity}% | 🌬️ {windspeed} km/h")
-tooltip_lines.append("─"*30)
-
-# Rain info for today (if any)
-rain_probs_today = []
-rain_start_time = None
-precip_total = 0
-
-for t, prob, precip in zip(times, rain_arr, hourly.get("precipitation", [0]*len(times))):
-    dt = datetime.fromisoformat(t)
-    if dt.date() == now.date() and dt >= now:
-        rain_probs_today.append(prob)
-        precip_total += precip
-        if prob > 0 and rain_start_time is None:
-            rain_start_time = dt
-
-if rain_probs_today and max(rain_probs_today) > 0:
-    max_prob_today = max(rain_probs_today)
-    tooltip_lines.append(f"<span foreground='{FG_HEADER}'>☔ Today's Rain:</span>")
-    tooltip_lines.append(f"🌧️ {max_prob_today}% chance | {precip_total:.1f}mm total")
-    if rain_start_time:
-        tooltip_lines.append(f"⏱️ Starting ~{rain_start_time.strftime('%I:%M %p')}")
+    if rain_probs_today and max(rain_probs_today) > 0:
+        max_prob_today = max(rain_probs_today)
+        tooltip_lines.append(f"<span foreground='{FG_HEADER}'>☔ Today's Rain:</span>")
+        tooltip_lines.append(f"🌧️ {max_prob_today}% chance | {precip_total:.1f}mm total")
+        if rain_start_time:
+            tooltip_lines.append(f"⏱️ Starting ~{rain_start_time.strftime('%I:%M %p')}")
+        tooltip_lines.append("─"*30)
+
+    # Today hourly (show only next 6 hours)
+    tooltip_lines.append(f"<span foreground='{FG_HEADER}'>☀️ Today:</span>")
+    try:
+        temps_h = hourly.columns["temperature_2m"]
+        codes_h = hourly.columns["weathercode"]
+        for i in range(today_start, min(today_start + 6, today_end)):
+            hour = hourly.time(i).strftime("%H:%M")
+            icon_h, desc_h = WEATHER_MAP.get(codes_h[i], ("❓", "Unknown"))
+            short_desc = SHORT_DESC_MAP.get(desc_h, desc_h)
+            color = temp_to_color(temps_h[i])
+            tooltip_lines.append(f"{hour} <span foreground='{color}'>{temps_h[i]:>2}°C</span> {icon_h} {short_desc}")
+    except Exception:
+        tooltip_lines.append("Hourly unavailable")
     tooltip_lines.append("─"*30)
 
-# Today hourly (show only next 6 hours)
-tooltip_lines.append(f"<span foreground='{FG_HEADER}'>☀️ Today:</span>")
-try:
-    temps_h = hourly["temperature_2m"]
-    codes_h = hourly["weathercode"]
-    hour_count = 0
-    for t, temp_h, code_h in zip(times, temps_h, codes_h):
-        dt = datetime.fromisoformat(t)
-        if dt < now or dt.date() != now.date() or hour_count >= 6:
-            continue
-        hour = dt.strftime("%H:%M")
-        icon_h, desc_h = WEATHER_MAP.get(code_h, ("❓", "Unknown"))
-        short_desc = SHORT_DESC_MAP.get(desc_h, desc_h)
-        color = temp_to_color(temp_h)
-        tooltip_lines.append(f"{hour} <span foreground='{color}'>{temp_h:>2}°C</span> {icon_h} {short_desc}")
-        hour_count += 1
-except Exception:
-    tooltip_lines.append("Hourly unavailable")
-tooltip_lines.append("─"*30)
-
-# Tomorrow (only 4 key times)
-tomorrow = now.date() + timedelta(days=1)
-tooltip_lines.append(f"<span foreground='{FG_HEADER}'>⛅ Tomorrow:</span>")
-try:
-    TIME_LABELS = {6: "Morn", 12: "Noon", 15: "Aft", 18: "Eve"}
-    for t, temp_h, code_h in zip(times, temps_h, codes_h):
-        dt = datetime.fromisoformat(t)
-        if dt.date() != tomorrow:
-            continue
-        label = TIME_LABELS.get(dt.hour)
-        if not label:
-            continue
-        icon_h, desc_h = WEATHER_MAP.get(code_h, ("❓", "Unknown"))
-        short_desc = SHORT_DESC_MAP.get(desc_h, desc_h)
-        color = temp_to_color(temp_h)
-        tooltip_lines.append(f"{label:<4} <span foreground='{color}'>{temp_h:>2}°C</span> {icon_h} {short_desc}")
-except Exception:
-    tooltip_lines.append("Tomorrow unavailable")
-tooltip_lines.append("─"*30)
-
-# 3-day forecast (skip today)
-daily = data["daily"]
-dates = daily["time"]
-max_temps = daily["temperature_2m_max"]
-min_temps = daily["temperature_2m_min"]
-codes_d = daily["weathercode"]
-tooltip_lines.append(f"<span foreground='{FG_HEADER}'>📅 3-Day Forecast:</span>")
-
-for i in range(1, min(DAYS_FORECAST+1, len(dates))):
-    day_name = calendar.day_name[datetime.fromisoformat(dates[i]).weekday()][:3]
-    icon_f, desc_full = WEATHER_MAP.get(codes_d[i], ("❓", "Unknown"))
-    short_desc = SHORT_DESC_MAP.get(desc_full, desc_full)
-    tooltip_lines.append(
-        f"{day_name} "
-        f"⬆️<span foreground='{temp_to_color(max_temps[i])}'>{max_temps[i]:>2}°C</span> "
-        f"⬇️<span foreground='{temp_to_color(min_temps[i])}'>{min_temps[i]:>2}°C</span> "
-        f"{icon_f} {short_desc}"
-    )
-
-tooltip_lines.append("─"*30)
-tooltip_lines.append(f"<span foreground='{FG_HEADER}'>🖱️ LMB: Full | RMB: Radar</span>")
+    # Tomorrow (only 4 key times)
+    tomorrow = now.date() + timedelta(days=1)
+    tooltip_lines.append(f"<span foreground='{FG_HEADER}'>⛅ Tomorrow:</span>")
+    try:
+        TIME_LABELS = {6: "Morn", 12: "Noon", 15: "Aft", 18: "Eve"}
+        for hour, label in TIME_LABELS.items():
+            key = datetime(tomorrow.year, tomorrow.month, tomorrow.day, hour)
+            i = hourly.index_from(key)
+            if i >= len(hourly) or hourly.stamps[i] != stamp(key):
+                continue
+            icon_h, desc_h = WEATHER_MAP.get(codes_h[i], ("❓", "Unknown"))
+            short_desc = SHORT_DESC_MAP.get(desc_h, desc_h)
+            color = temp_to_color(temps_h[i])
+            tooltip_lines.append(f"{label:<4} <span foreground='{color}'>{temps_h[i]:>2}°C</span> {icon_h} {short_desc}")
+    except Exception:
+        tooltip_lines.append("Tomorrow unavailable")
+    tooltip_lines.append("─"*30)
+
+    # 3-day forecast (skip today)
+    daily = data["daily"]
+    dates = daily["time"]
+    max_temps = daily["temperature_2m_max"]
+    min_temps = daily["temperature_2m_min"]
+    codes_d = daily["weathercode"]
+    tooltip_lines.append(f"<span foreground='{FG_HEADER}'>📅 3-Day Forecast:</span>")
+
+    for i in range(1, min(DAYS_FORECAST+1, len(dates))):
+        day_name = date.fromisoformat(dates[i]).strftime("%A")[:3]  # Same as calendar.day_name
+        icon_f, desc_full = WEATHER_MAP.get(codes_d[i], ("❓", "Unknown"))
+        short_desc = SHORT_DESC_MAP.get(desc_full, desc_full)
+        tooltip_lines.append(
+            f"{day_name} "
+            f"⬆️<span foreground='{temp_to_color(max_temps[i])}'>{max_temps[i]:>2}°C</span> "
+            f"⬇️<span foreground='{temp_to_color(min_temps[i])}'>{min_temps[i]:>2}°C</span> "
+            f"{icon_f} {short_desc}"
+        )
+
+    tooltip_lines.append("─"*30)
+
+    # Other sites, one compact row each: now, today's high/low
+    if LOCATIONS:
+        tooltip_lines.append(f"<span foreground='{FG_HEADER}'>📍 Sites:</span>")
+        name_width = max(len(name) for name, _, _ in LOCATIONS)
+        for (name, _, _), site in zip(LOCATIONS, site_data):
+            try:
+                site_temp = site["current_weather"]["temperature"]
+                site_icon, _ = WEATHER_MAP.get(site["current_weather"]["weathercode"], ("❓", "Unknown"))
+                site_max = site["daily"]["temperature_2m_max"][0]
+                site_min = site["daily"]["temperature_2m_min"][0]
+                tooltip_lines.append(
+                    f"{name:<{name_width}} {site_icon} <span foreground='{temp_to_color(site_temp)}'>{site_temp:>4}°C</span> "
+                    f"⬆️<span foreground='{temp_to_color(site_max)}'>{site_max:>2}°C</span> "
+                    f"⬇️<span foreground='{temp_to_color(site_min)}'>{site_min:>2}°C</span>"
+                )
+            except Exception:
+                tooltip_lines.append(f"{name:<{name_width}} unavailable")
+        tooltip_lines.append("─"*30)
+
+    # Fetch timings and errors, with --stats
+    debug = stats.tooltip_lines(STATS)
+    if debug:
+        tooltip_lines += debug + ["─"*30]
+
+    tooltip_lines.append(f"<span foreground='{FG_HEADER}'>🖱️ LMB: Full | RMB: Radar</span>")
+
+    return {
+        "text": text,
+        "tooltip": "\n".join(tooltip_lines),
+        "markup": "pango"
+    }
+
+def build_output(resident=False):
+    """The module's JSON; resident=True refreshes in threads of this process."""
+    try:
+        lat, lon, location_name = get_location_by_ip(resident)
+        data, *site_data = get_forecasts([(lat, lon)] + [(lat, lon) for _, lat, lon in LOCATIONS], resident)
+        return render(data, location_name, site_data)
+    except WeatherUnavailable as e:
+        return unavailable_output(str(e))
 
 # ---------------- OUTPUT
-print(json.dumps({
-    "text": text,
-    "tooltip": "\n".join(tooltip_lines),
-    "markup": "pango"
-}, ensure_ascii=False))
+def main():
+    if "--stats" in sys.argv[1:]:
+        # Times the ipinfo and forecast fetches, shown in the tooltip
+        sys.argv.remove("--stats")
+        stats.enable()
+
+    if sys.argv[1:2] == ["--profile-startup"]:
+        import startup
+        sys.exit(startup.profile(__file__, sys.argv[2:], STARTUP_BUDGET_MS))
+
+    if sys.argv[1:2] == ["--refresh"]:
+        refresh_forecasts([tuple(map(float, c.split(","))) for c in sys.argv[2:]])
+        return
+
+    print(json.dumps(build_output(), ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()